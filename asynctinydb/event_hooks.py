@@ -0,0 +1,225 @@
+"""
+Event hook primitives used by storages and tables.
+
+These are thin subclasses of the ones in :mod:`vermils.react`, adding fast
+paths for the common cases in TinyDB, where most events have no more than
+one action bound to them.
+"""
+
+from __future__ import annotations
+import asyncio
+from typing import Any, AsyncGenerator, Iterable
+from vermils.react import ActionCentipede as _ActionCentipede
+from vermils.react import ActionChain as _ActionChain
+from vermils.react import EventHint as _EventHint
+from vermils.react import EventHook as _EventHook
+from vermils.collections import StrChain
+from vermils.react.actionchain import ActionVar, AsyncActionVar
+
+__all__ = ("ActionChain", "ActionCentipede", "EventHook", "EventHint")
+
+
+class ActionChain(_ActionChain[ActionVar]):
+    """
+    # Simple Event Hooks Framework
+    * First argument to all functions is the event name,
+    following the rest of the arguments.
+    """
+
+    def __init__(self, actions: Iterable[ActionVar] | None = None,
+                 limit: int = 0) -> None:
+        """#### Initialize the ActionChain.
+        * `actions` is an iterable of actions to add to the chain.
+        * `limit` is the maximum number of actions to add to the chain.
+        Set to 0 for unlimited.
+        """
+        # No temporary empty list when there are no actions
+        self._seq: list[ActionVar] = [] if actions is None else list(actions)
+        self.limit = limit
+        self._actions: tuple[ActionVar, ...] | None = None
+        """Snapshot of the actions, dropped whenever the chain changes"""
+        self._index: set[ActionVar] | None = None
+        """The actions for membership tests, dropped along with `_actions`"""
+
+    @property
+    def actions(self) -> tuple[ActionVar, ...]:
+        actions = self._actions
+        if actions is None:
+            actions = self._actions = tuple(self._seq)
+        return actions
+
+    def append(self, action: ActionVar) -> None:
+        super().append(action)
+        self._actions = self._index = None
+
+    def insert(self, index: int, action: ActionVar) -> None:
+        super().insert(index, action)
+        self._actions = self._index = None
+
+    def extend(self, actions: Iterable[ActionVar]) -> None:
+        super().extend(actions)
+        self._actions = self._index = None
+
+    def remove(self, action: ActionVar) -> None:
+        if action not in self:  # Fails fast without scanning the list
+            raise ValueError(f"{action!r} not in ActionChain")
+        super().remove(action)
+        self._actions = self._index = None
+
+    def clear(self) -> None:
+        super().clear()
+        self._actions = self._index = None
+
+    def __iadd__(self, other: _ActionChain[ActionVar]  # type: ignore[misc]
+                 ) -> ActionChain[ActionVar]:
+        ret = super().__iadd__(other)
+        self._actions = self._index = None
+        return ret
+
+    def __contains__(self, value: object) -> bool:
+        index = self._index
+        if index is None:
+            try:
+                index = self._index = set(self._seq)
+            except TypeError:  # An unhashable action, scan the list instead
+                return value in self._seq
+        try:
+            return value in index
+        except TypeError:  # Unhashable actions are not in the index either
+            return False
+
+    def trigger(self, event: str, *args: Any, **kw: Any) -> tuple:
+        """Trigger all actions in the chain."""
+        seq = self._seq
+        if len(seq) == 1:
+            return (seq[0](event, *args, **kw),)
+        # A list comprehension instead of a generator fed to `tuple`
+        return tuple([action(event, *args, **kw) for action in seq])
+
+    async def atrigger(self: ActionChain[AsyncActionVar],
+                       event: str, *args: Any, **kw: Any) -> tuple:
+        """Asynchronously trigger all actions in the chain."""
+        seq = self._seq
+        if not seq:
+            return ()
+        if len(seq) == 1:  # No need to schedule a task for a single action
+            return (await seq[0](event, *args, **kw),)
+        # A list unpacks faster than a generator and `gather` already
+        # returns a list, so only one tuple copy is made
+        coros = [action(event, *args, **kw) for action in seq]
+        return tuple(await asyncio.gather(*coros))
+
+    async def ordered_atrigger(self: ActionChain[AsyncActionVar],
+                               event: str, *args: Any, **kw: Any) -> tuple:
+        """Asynchronously trigger all actions in the chain in order."""
+        seq = self._seq
+        if not seq:
+            return ()
+        if len(seq) == 1:
+            return (await seq[0](event, *args, **kw),)
+        return tuple([await action(event, *args, **kw) for action in seq])
+
+    async def atrigger_stream(self: ActionChain[AsyncActionVar],
+                              event: str, *args: Any, **kw: Any
+                              ) -> AsyncGenerator[Any, None]:
+        """
+        Asynchronously trigger all actions in the chain,
+        yielding the results as soon as they complete.
+        """
+        coros = [action(event, *args, **kw) for action in self._seq]
+        for fut in asyncio.as_completed(coros):
+            yield await fut
+
+
+class ActionCentipede(_ActionCentipede[ActionVar]):
+    """
+    # ActionCentipede Class
+    The return values of an action are passed to the next action as arguments.
+    """
+
+    def trigger(self, event: str, *args: Any, **kw: Any) -> Any:
+        """Trigger all actions in the chain."""
+        if self.sentinel:
+            return super().trigger(event, *args, **kw)
+        # Without a sentinel, the previous result is the only argument
+        it = iter(reversed(self._seq) if self.reverse else self._seq)
+        action = next(it, None)
+        if action is None:
+            return None
+        ret = action(event, *args, **kw)
+        for action in it:
+            ret = action(event, ret)
+        return ret
+
+    async def atrigger(self: ActionCentipede[AsyncActionVar],
+                       event: str, *args: Any, **kw: Any) -> Any:
+        """Asynchronously trigger all actions in the chain."""
+        if self.sentinel:
+            return await super().atrigger(event, *args, **kw)
+        it = iter(reversed(self._seq) if self.reverse else self._seq)
+        action = next(it, None)
+        if action is None:
+            return None
+        ret = await action(event, *args, **kw)
+        for action in it:
+            ret = await action(event, ret)
+        return ret
+
+
+class EventHook(_EventHook):
+    """
+    # Event Hook Class
+    Binds events to action chains.
+    """
+
+    def emit(self, event: str, *args: Any, **kw: Any) -> tuple | Any:
+        """Trigger an event"""
+        chain = dict.get(self, event)
+        if chain is None:
+            raise ValueError(f"Event '{event}' not found, add it first")
+        if not chain:  # Return what an empty chain would without triggering
+            return None if isinstance(chain, _ActionCentipede) else ()
+        return chain.trigger(event, *args, **kw)
+
+    async def aemit(self, event: str, *args: Any, **kw: Any) -> tuple | Any:
+        """Trigger an event, asynchronously"""
+        chain = dict.get(self, event)
+        if chain is None:
+            raise ValueError(f"Event '{event}' not found, add it first")
+        if not chain:
+            return None if isinstance(chain, _ActionCentipede) else ()
+        return await chain.atrigger(event, *args, **kw)
+
+    def aemit_stream(self, event: str, *args: Any, **kw: Any
+                     ) -> AsyncGenerator[Any, None]:
+        """
+        Trigger an event asynchronously,
+        yielding the results of the actions as they complete.
+        """
+        if event not in self:
+            raise ValueError(f"Event '{event}' not found, add it first")
+        chain = self[event]
+        if not isinstance(chain, ActionChain):
+            raise TypeError(f"Event '{event}' does not support streaming")
+        return chain.atrigger_stream(event, *args, **kw)
+
+
+class EventHint(_EventHint):
+    """# Event Hint
+    * This class is used to hint the event name to the event hook.
+    * It is also used to prevent typos in the event name.
+    * Inherit this class and add the event names as class attributes.
+    * Sub-hints are created once per attribute and then reused."""
+
+    def __init__(self, event_hook: EventHook = None, strchain: StrChain = None):
+        super().__init__(event_hook, strchain)
+        self._children: dict[str, EventHint] = {}
+
+    def __getattribute__(self, event: str) -> EventHint:
+        if event.startswith("_"):
+            return object.__getattribute__(self, event)
+        children = self._children
+        child = children.get(event)
+        if child is None:
+            child = children[event] = EventHint(strchain=self._chain[event])
+        return child
@@ -4,6 +4,8 @@ middlewares and implementations.
 """
 
 from __future__ import annotations
+import asyncio
+from contextlib import suppress
 from typing import TypeVar, Type, Generic
 from .storages import Storage
 
@@ -33,6 +35,13 @@ class Middleware(Generic[S]):
     def event_hook(self):
         return self.storage.event_hook
 
+    def mark_clean(self, name: str) -> None:
+        """Not forwarded, the storage may not be written right away."""
+
+    def is_current(self, data) -> bool:
+        """Not forwarded, the middleware may hold data other than the storage."""
+        return False
+
     def __call__(self, *args, **kwargs):
         """
         Create the storage instance and store it as self.storage.
@@ -91,16 +100,25 @@ class CachingMiddleware(Middleware[S]):
     This Middleware aims to improve the performance of TinyDB by writing only
     the last DB state every :attr:`WRITE_CACHE_SIZE` time and reading always
     from cache.
+
+    With `flush_interval` set, the last DB state is also written that many
+    seconds after the first write not yet flushed, however many follow.
     """
 
-    def __init__(self, storage_cls: Type[S], cache_size=1000):
+    def __init__(self, storage_cls: Type[S], cache_size=1000,
+                 flush_interval: float | None = None):
         # Initialize the parent constructor
         super().__init__(storage_cls)
 
         # Prepare the cache
         self.cache = None
         self.cache_size = cache_size
+        self.flush_interval = flush_interval
         self._cache_modified_count = 0
+        self._flush_handle: asyncio.TimerHandle | None = None
+        """The deferred flush, if one is scheduled"""
+        self._flush_task: asyncio.Task | None = None
+        """The deferred flush, once it has started"""
 
     @property
     def WRITE_CACHE_SIZE(self):
@@ -134,17 +152,45 @@ class CachingMiddleware(Middleware[S]):
         # Check if we need to flush the cache
         if self._cache_modified_count >= self.cache_size:
             await self.flush()
+        elif self.flush_interval is not None and self._flush_handle is None:
+            # Later writes are merged into this flush
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                self.flush_interval, self._deferred_flush)
+
+    def _deferred_flush(self):
+        self._flush_handle = None
+        self._flush_task = asyncio.create_task(self._flush_quietly())
+
+    async def _flush_quietly(self):
+        # A failed flush leaves the cache dirty, to be flushed again
+        # by the next flush or on close, which report the error
+        with suppress(Exception):
+            await self.flush()
 
     async def flush(self):
         """
         Flush all unwritten data to disk.
         """
-        if self._cache_modified_count:
-            # Force-flush the cache by writing the data to the storage
-            await self.storage.write(self.cache)
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        count = self._cache_modified_count
+        if count:
+            # Writes made while this one is in progress stay unflushed
             self._cache_modified_count = 0
+            try:
+                # Force-flush the cache by writing the data to the storage
+                await self.storage.write(self.cache)
+            except BaseException:
+                self._cache_modified_count += count
+                raise
 
     async def close(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._flush_task is not None:
+            await self._flush_task
         if self.storage.closed and self._cache_modified_count:
             raise IOError("Storage is closed before flushing the cache")
 
@@ -1,12 +1,16 @@
 """Modifier class for TinyDB."""
 
 from __future__ import annotations
+import os
+import json
 import time
-from typing import Any, Callable, Mapping, Sequence, TypeVar, overload
+import threading
+from typing import Any, Callable, Iterable, Mapping, Sequence, TypeVar
+from typing import overload
 import datetime as dt
 import cachetools
 from warnings import warn
-from functools import partial
+from functools import lru_cache
 from cachetools import Cache
 from vermils.asynctools import async_run
 from vermils.collections.fridge import FrozenDict
@@ -18,8 +22,13 @@ from .table import BaseID, Table, IncreID, Document, BaseDocument
 
 T = TypeVar("T", bound=Table)
 S = TypeVar('S', bound=Storage)
+V = TypeVar("V")
 SWRPH = TypeVar("SWRPH", bound=StorageWithWriteReadPrePostHooks)
 
+# Below these sizes, hopping to a worker thread costs more than the work
+_INLINE_BYTES = 4096
+_INLINE_DOCS = 32
+
 
 def _get_storage(item: S | TinyDB[S]) -> S:
     """Get the storage from a TinyDB or Storage object."""
@@ -28,6 +37,18 @@ def _get_storage(item: S | TinyDB[S]) -> S:
     return item
 
 
+def _count_docs(data: Mapping) -> int:
+    """Count the documents in a database state, whose values are tables."""
+    return sum(len(t) for t in data.values() if isinstance(t, Mapping))
+
+
+async def _run(inline: bool, func: Callable[..., V], *args, **kw) -> V:
+    """Run `func` on the event loop if `inline`, otherwise in a thread."""
+    if inline:
+        return func(*args, **kw)
+    return await async_run(func, *args, **kw)
+
+
 @overload
 def _get_table(item: TinyDB) -> Table[IncreID, Document]: ...  # type: ignore[overload-overlap]
 @overload
@@ -41,6 +62,12 @@ def _get_table(item):
     return item
 
 
+@lru_cache(maxsize=4096)
+def _fromisoformat(date_string: str) -> dt.datetime:
+    """Cached `datetime.fromisoformat`, timestamps tend to repeat across reads."""
+    return dt.datetime.fromisoformat(date_string)
+
+
 class Modifier:
     class Encryption:
         """
@@ -57,46 +84,80 @@ class Modifier:
 
             * `s` - `Storage` or `TinyDB` to modify
             * `key` - Encryption key (must be 16, 24, or 32 bytes long)
-            * `encoding` - Encoding to use for string data
+
+            Data written by the former PyCryptodome backend
+            (including truncated MAC tags) can still be decrypted.
             """
 
             try:
-                from Crypto.Cipher import AES
-                from Crypto.Cipher._mode_gcm import GcmMode
+                from cryptography.hazmat.primitives.ciphers import Cipher
+                from cryptography.hazmat.primitives.ciphers import algorithms
+                from cryptography.hazmat.primitives.ciphers import modes
+                from cryptography.hazmat.primitives.ciphers.aead import AESGCM
             except ImportError as e:
                 raise ImportError(
                     "Dependencies not satisfied: "
                     "pip install async-tinydb[encryption]") from e
 
+            if kw:
+                warn("Modifier.Encryption.AES_GCM: extra keyword arguments "
+                     "are ignored", DeprecationWarning, stacklevel=2)
+
             s = _get_storage(s)
 
             if isinstance(key, str):
                 key = key.encode("utf-8")
-            kw["mode"] = AES.MODE_GCM
+            # Key expansion happens only once, bind hot-path callables locally
+            aes = algorithms.AES(key)
+            aesgcm = AESGCM(key)
+            encrypt, decrypt = aesgcm.encrypt, aesgcm.decrypt
+            encrypt_into = getattr(aesgcm, "encrypt_into", None)  # >= 45.0
+            urandom = os.urandom
             dtype: type = bytes
 
+            def seal(nonce: bytes, data: bytes) -> bytes | bytearray:
+                """Encrypt to the tag length (16), tag, nonce and ciphertext."""
+                if encrypt_into is None:
+                    ct = memoryview(encrypt(nonce, data, None))
+                    return b"".join((b"\x10", ct[-16:], nonce, ct[:-16]))
+                # Encrypt straight into place instead of joining a copy,
+                # `cryptography` appends the tag, which is moved to the front
+                end = 33 + len(data)
+                out = bytearray(end + 16)
+                with memoryview(out) as view:
+                    encrypt_into(nonce, data, None, view[33:])
+                    view[1:17] = view[end:]
+                out[0] = 16
+                out[17:33] = nonce
+                del out[end:]
+                return out
+
             @s.on.write.post
             async def encrypt_aes_gcm(_: str, s: Storage, data: str | bytes):
                 nonlocal dtype
-                cipher: GcmMode = AES.new(key, **kw)
                 if isinstance(data, str):
                     dtype = str
                     data = data.encode("utf-8")
-                task = async_run(cipher.encrypt_and_digest, data)
-                data, digest = await task
-                data = len(digest).to_bytes(1, "little") + \
-                    digest + cipher.nonce + data
-
-                return data
+                # 16 bytes nonce keeps the layout of PyCryptodome's default
+                nonce = urandom(16)
+                return await _run(len(data) < _INLINE_BYTES, seal, nonce, data)
 
             @s.on.read.pre
             async def decrypt_aes_gcm(_: str, s: Storage, data: bytes):
                 d_len = data[0]  # digest length
                 digest = data[1: d_len + 1]
-                cipher: GcmMode = AES.new(key,
-                                          nonce=data[d_len + 1:d_len + 17], **kw)
+                nonce = data[d_len + 1:d_len + 17]
                 data = data[d_len + 17:]
-                task = async_run(cipher.decrypt_and_verify, data, digest)
+                if d_len == 16:
+                    task = _run(len(data) < _INLINE_BYTES,
+                                decrypt, nonce, data + digest, None)
+                else:
+                    # Truncated tags are only supported by the streaming API
+                    decryptor = Cipher(
+                        aes, modes.GCM(nonce, digest, min_tag_length=d_len),
+                    ).decryptor()
+                    task = async_run(
+                        lambda: decryptor.update(data) + decryptor.finalize())
                 ret = await task
 
                 if dtype is bytes:
@@ -105,6 +166,67 @@ class Modifier:
 
             return s
 
+        @staticmethod
+        def ChaCha20_Poly1305(s: SWRPH | TinyDB[SWRPH],
+                              key: str | bytes) -> SWRPH:
+            """
+            ### Add ChaCha20-Poly1305 Encryption to TinyDB Storage
+            Hooks to `write.post` and `read.pre` to encrypt/decrypt data.
+            Works on any storage class that store data as string or  bytes.
+            Faster than AES-GCM on CPUs without AES instructions,
+            e.g. many ARM cores.
+
+            * `s` - `Storage` or `TinyDB` to modify
+            * `key` - Encryption key (must be 32 bytes long)
+            """
+
+            try:
+                from cryptography.hazmat.primitives.ciphers.aead import \
+                    ChaCha20Poly1305
+            except ImportError as e:
+                raise ImportError(
+                    "Dependencies not satisfied: "
+                    "pip install async-tinydb[encryption]") from e
+
+            s = _get_storage(s)
+
+            if isinstance(key, str):
+                key = key.encode("utf-8")
+            chacha = ChaCha20Poly1305(key)
+            encrypt, decrypt = chacha.encrypt, chacha.decrypt
+            encrypt_into = getattr(chacha, "encrypt_into", None)  # >= 45.0
+            urandom = os.urandom
+            dtype: type = bytes
+
+            def seal(nonce: bytes, data: bytes) -> bytes | bytearray:
+                """Encrypt to the nonce, ciphertext and tag (16)."""
+                if encrypt_into is None:
+                    return nonce + encrypt(nonce, data, None)
+                out = bytearray(28 + len(data))
+                out[:12] = nonce
+                with memoryview(out) as view:
+                    encrypt_into(nonce, data, None, view[12:])
+                return out
+
+            @s.on.write.post
+            async def encrypt_chacha(_: str, s: Storage, data: str | bytes):
+                nonlocal dtype
+                if isinstance(data, str):
+                    dtype = str
+                    data = data.encode("utf-8")
+                nonce = urandom(12)
+                return await _run(len(data) < _INLINE_BYTES, seal, nonce, data)
+
+            @s.on.read.pre
+            async def decrypt_chacha(_: str, s: Storage, data: bytes):
+                ret = await _run(len(data) < _INLINE_BYTES,
+                                 decrypt, data[:12], data[12:], None)
+                if dtype is bytes:
+                    return ret
+                return dtype(ret, encoding="utf-8")
+
+            return s
+
     @classmethod
     def add_encryption(cls, s: SWRPH | TinyDB[SWRPH], key: str | bytes,
                        encoding: str = None, **kw) -> SWRPH:
@@ -163,11 +285,12 @@ class Modifier:
                 if isinstance(data, str):
                     dtype = str
                     data = data.encode("utf-8")
+                # Dense qualities are slow even on small data, always offload
                 return await async_run(brotli.compress, data, **kw)
 
             @s.on.read.pre
             async def decompress_brotli(ev: str, s: Storage, data: bytes):
-                task = async_run(brotli.decompress, data)
+                task = _run(len(data) < _INLINE_BYTES, brotli.decompress, data)
                 if dtype is bytes:
                     return await task
                 return dtype(await task, encoding="utf-8")
@@ -202,17 +325,112 @@ class Modifier:
                 if isinstance(data, str):
                     dtype = str
                     data = data.encode("utf-8")
-                return await async_run(blosc2.compress, data, **kw)
+                return await _run(len(data) < _INLINE_BYTES,
+                                  blosc2.compress, data, **kw)
 
             @s.on.read.pre
             async def decompress_blosc2(_: str, s: Storage, data: bytes):
-                task = async_run(blosc2.decompress, data)
+                task = _run(len(data) < _INLINE_BYTES, blosc2.decompress, data)
                 if dtype is bytes:
                     return await task
                 return dtype(await task, encoding="utf-8")
 
             return s
 
+        @staticmethod
+        def zstd(s: SWRPH | TinyDB[SWRPH], level=3, threads=-1,
+                 dict_data: bytes | None = None, **kw) -> SWRPH:
+            """
+            ### Add Zstandard Compression to TinyDB Storage
+            Hooks to `write.post` and `read.pre` to compress/decompress data.
+            Works on any storage class that store data as string or  bytes.
+
+            * `s` - `Storage` or `TinyDB` to modify
+            * `level` - Compression level [1-22], higher is denser but slower
+            * `threads` - Worker threads used to compress large data,
+            `-1` for all cores, `0` to disable
+            * `dict_data` - A dictionary from :meth:`zstd_dictionary`,
+            needed to read the data back as well
+            """
+
+            try:
+                import zstandard
+            except ImportError as e:
+                raise ImportError(
+                    "Dependencies not satisfied: "
+                    "pip install async-tinydb[compression]") from e
+
+            s = _get_storage(s)
+            kw["level"] = level
+            dctx_kw = {}
+            if dict_data is not None:
+                # Parsed once, shared by every context
+                kw["dict_data"] = dctx_kw["dict_data"] = \
+                    zstandard.ZstdCompressionDict(dict_data)
+            dtype: type = bytes
+            # Contexts are reused but not thread-safe, keep one per thread
+            local = threading.local()
+
+            def compress(data: bytes) -> bytes:
+                # Multithreading only pays off for large data,
+                # the output is a single standard frame either way
+                if threads and len(data) >= 1 << 20:
+                    if not hasattr(local, "mtctx"):
+                        local.mtctx = zstandard.ZstdCompressor(
+                            threads=threads, **kw)
+                    return local.mtctx.compress(data)
+                if not hasattr(local, "cctx"):
+                    local.cctx = zstandard.ZstdCompressor(**kw)
+                return local.cctx.compress(data)
+
+            def decompress(data: bytes) -> bytes:
+                if not hasattr(local, "dctx"):
+                    local.dctx = zstandard.ZstdDecompressor(**dctx_kw)
+                return local.dctx.decompress(data)
+
+            @s.on.write.post
+            async def compress_zstd(_: str, s: Storage, data: str | bytes):
+                nonlocal dtype
+                if isinstance(data, str):
+                    dtype = str
+                    data = data.encode("utf-8")
+                return await _run(len(data) < _INLINE_BYTES, compress, data)
+
+            @s.on.read.pre
+            async def decompress_zstd(_: str, s: Storage, data: bytes):
+                task = _run(len(data) < _INLINE_BYTES, decompress, data)
+                if dtype is bytes:
+                    return await task
+                return dtype(await task, encoding="utf-8")
+
+            return s
+
+        @staticmethod
+        def zstd_dictionary(samples: Iterable[str | bytes | Mapping],
+                            size=8192) -> bytes:
+            """
+            ### Train a Zstandard Dictionary
+            For :meth:`zstd`, which then compresses small data such as
+            journal records or small databases much denser.
+
+            * `samples` - Representative data, e.g. documents of the database,
+            at least a few hundred of them. Mappings are serialized as JSON.
+            * `size` - Maximum size of the dictionary in bytes
+            """
+
+            try:
+                import zstandard
+            except ImportError as e:
+                raise ImportError(
+                    "Dependencies not satisfied: "
+                    "pip install async-tinydb[compression]") from e
+
+            data = [sample.encode("utf-8") if isinstance(sample, str)
+                    else json.dumps(sample, ensure_ascii=False).encode("utf-8")
+                    if isinstance(sample, Mapping) else sample
+                    for sample in samples]
+            return zstandard.train_dictionary(size, data).as_bytes()
+
     class Conversion:
         """
         ## Conversion Subclass
@@ -272,7 +490,7 @@ class Modifier:
 
             import re
             import uuid
-            import base64
+            from binascii import a2b_base64, b2a_base64
             from datetime import datetime, timedelta
 
             s = _get_storage(s)
@@ -282,14 +500,15 @@ class Modifier:
                 dict: lambda x, c: {k: c(v) for k, v in x.items()},
                 FrozenDict: lambda x, c: {k: c(v) for k, v in x.items()},
                 list: lambda x, c: [c(v) for v in x],
-                tuple: lambda x, c: {"$tuple": tuple(c(v) for v in x)},
-                set: lambda x, c: {"$set": tuple(c(v) for v in x)},
-                frozenset: lambda x, c: {"$frozenset": tuple(c(v) for v in x)},
+                tuple: lambda x, c: {"$tuple": tuple(map(c, x))},
+                set: lambda x, c: {"$set": tuple(map(c, x))},
+                frozenset: lambda x, c: {"$frozenset": tuple(map(c, x))},
                 uuid.UUID: lambda x, c: {"$uuid": str(x)},
                 datetime: lambda x, c: {"$date": x.isoformat()},
                 timedelta: lambda x, c: {"$timedelta": x.total_seconds()},
                 re.Pattern: lambda x, c: {"$regex": (x.pattern, x.flags)},
-                bytes: lambda x, c: {"$bytes": base64.b64encode(x).decode()},
+                bytes: lambda x, c: {
+                    "$bytes": b2a_base64(x, newline=False).decode("ascii")},
                 complex: lambda x, c: {"$complex": (x.real, x.imag)},
             }
 
@@ -299,11 +518,25 @@ class Modifier:
                 keys = sort_class(tmp)
                 _type_hooks = {k: tmp[k] for k in keys if tmp[k] is not None}
 
+            @lru_cache(maxsize=256)
+            def _resolve(t: type):
+                """Resolve the hook of a type without a precise match"""
+                for bt, hook in _type_hooks.items():
+                    if issubclass(t, bt):
+                        return hook
+                return None
+
+            # Like the `default` callback of a JSON encoder, hooks only see
+            # non-native types, unless a native type is hooked explicitly
+            _natives = frozenset(
+                t for t in (str, int, float, bool, type(None))
+                if not any(issubclass(t, h) for h in _type_hooks))
+
             _marker_hooks = {
                 "$uuid": lambda x, r: uuid.UUID(x["$uuid"]),
-                "$date": lambda x, r: datetime.fromisoformat(x["$date"]),
+                "$date": lambda x, r: _fromisoformat(x["$date"]),
                 "$timedelta": lambda x, r: timedelta(seconds=x["$timedelta"]),
-                "$bytes": lambda x, r: base64.b64decode(x["$bytes"].encode()),
+                "$bytes": lambda x, r: a2b_base64(x["$bytes"]),
                 "$complex": lambda x, r: complex(*x["$complex"]),
                 "$set": lambda x, r: set(x["$set"]),
                 "$frozenset": lambda x, r: frozenset(x["$frozenset"]),
@@ -317,30 +550,35 @@ class Modifier:
                         _marker_hooks[_k] = _v
                     else:
                         _marker_hooks.pop(_k, None)
+            _markers = frozenset(_marker_hooks)
 
-            def convert(obj, memo: set = None):
+            def convert(data):
                 """
                 ### Recursively Convert Function
                 Performs a loop reference check and converts the object.
                 """
 
-                memo = memo.copy() if memo else set()  # Anti-recursion
-                _id = id(obj)
-                if _id in memo:
-                    raise ValueError("Circular reference detected")
-                memo.add(_id)
-                _convert = partial(convert, memo=memo)
-
-                # Try precise matching
-                if type(obj) in _type_hooks:
-                    obj = _type_hooks[type(obj)](obj, _convert)
-
-                # General matching
-                else:
-                    for t, hook in _type_hooks.items():
-                        if isinstance(obj, t):
+                memo: set[int] = set()  # Anti-recursion, ids on the current path
+
+                def _convert(obj):
+                    t = type(obj)
+                    if t in _natives:
+                        return obj
+                    _id = id(obj)
+                    if _id in memo:
+                        raise ValueError("Circular reference detected")
+                    memo.add(_id)
+                    try:
+                        # Try precise matching, then the cached general matching
+                        hook = _type_hooks.get(t) or _resolve(t)
+                        if hook is not None:
                             obj = hook(obj, _convert)
-                return obj
+                    finally:
+                        # Shared (non-circular) references are allowed
+                        memo.discard(_id)
+                    return obj
+
+                return _convert(data)
 
             def recover(obj) -> Any:
                 """
@@ -348,12 +586,16 @@ class Modifier:
                 **No loop reference check**
                 """
 
-                if type(obj) is list:
+                t = type(obj)
+                if t is list:
                     obj = [recover(v) for v in obj]
 
-                elif type(obj) is dict:
+                elif t is dict:
                     obj = {k: recover(v) for k, v in obj.items()}
 
+                    # Most dicts carry no marker, skip the ordered scan
+                    if _markers.isdisjoint(obj):
+                        return obj
                     for marker, hook in _marker_hooks.items():
                         if marker in obj:
                             return hook(obj, recover)
@@ -361,11 +603,11 @@ class Modifier:
 
             @s.on.write.pre
             async def convert_xjson(_: str, s: Storage, data: dict):
-                return await async_run(convert, data)
+                return await _run(_count_docs(data) < _INLINE_DOCS, convert, data)
 
             @s.on.read.post
             async def recover_xjson(_: str, s: Storage, data: dict):
-                return await async_run(recover, data)
+                return await _run(_count_docs(data) < _INLINE_DOCS, recover, data)
 
             return s
 
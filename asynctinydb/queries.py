@@ -98,6 +98,10 @@ class QueryInstance:
         self._test = test
         self._frame = frame
         self._cacheable = cacheable
+        # Memoized hash of the frame it was computed from,
+        # ``Query`` replaces its frame while being built
+        self._hashed_frame: tuple | None = None
+        self._hash = 0
 
     def is_cacheable(self) -> bool:
         warn("`is_cacheable` is deprecated, use `cacheable` property",
@@ -121,8 +125,13 @@ class QueryInstance:
         # We calculate the query hash by using the ``frame`` object which
         # describes this query uniquely, so we can calculate a stable hash
         # value by simply hashing it
-        if self.cacheable:
-            return hash(self._frame)
+        if self._cacheable:
+            frame = self._frame
+            if frame is not self._hashed_frame:
+                # Hashing a frame hashes every nested tuple all over again
+                self._hash = hash(frame)
+                self._hashed_frame = frame
+            return self._hash
         raise TypeError("Cannot hash non-cacheable query")
 
     def __repr__(self) -> str:
@@ -270,19 +279,31 @@ class Query(QueryInstance):
         if not self._path and not allow_empty_path:
             raise ValueError("Query has no path")
 
-        def runner(value):
-            try:
-                # Resolve the path
-                for part in self._path:
-                    if isinstance(part, str):
-                        value = value[part]
-                    else:
-                        value = part(value)
-            except (KeyError, TypeError):
-                return False
-            else:
-                # Perform the specified test
+        path = self._path
+        if len(path) == 1 and isinstance(path[0], str):
+            # The most common case, a single field lookup
+            key = path[0]
+
+            def runner(value):
+                try:
+                    value = value[key]
+                except (KeyError, TypeError):
+                    return False
                 return test(value)
+        else:
+            def runner(value):
+                try:
+                    # Resolve the path
+                    for part in path:
+                        if isinstance(part, str):
+                            value = value[part]
+                        else:
+                            value = part(value)
+                except (KeyError, TypeError):
+                    return False
+                else:
+                    # Perform the specified test
+                    return test(value)
 
         return QueryInstance(
             runner,
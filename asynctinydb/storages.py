@@ -4,21 +4,51 @@ implementations.
 """
 from __future__ import annotations
 import io
+import codecs
 from abc import ABC, abstractmethod
 from typing import Any, Callable, Awaitable, Mapping, MutableMapping, TypeVar, cast
-from typing import TypeAlias
+from typing import Sequence, TypeAlias
+from collections.abc import Mapping as MappingABC  # Faster `isinstance`
 import os
 import shutil
+import threading
+from binascii import a2b_base64, b2a_base64
+from contextlib import suppress
+from copy import deepcopy
+from functools import partial
+from math import isfinite
 from tempfile import NamedTemporaryFile
-import ujson as json
-from vermils.react import EventHook, ActionChain, EventHint, ActionCentipede
 from vermils.asynctools import AsinkRunner
-from vermils.gadgets import stringify_keys
+from .event_hooks import ActionChain, ActionCentipede, EventHook, EventHint
 
 __all__ = ("Storage", "JSONStorage", "MemoryStorage")
 
 AsyncActionType: TypeAlias = Callable[..., Awaitable[None]]
 
+_OFFLOAD_THRESHOLD = 32 * 1024  # Parse data smaller than this inline
+# `fdatasync` skips metadata that is not needed to read the data back,
+# such as timestamps, it is only available on some platforms
+_fsync: Callable[[int], None] = getattr(os, "fdatasync", os.fsync)
+
+
+# Imported by `JSONStorage` on first use, see `_import_serializers`
+json: Any = None
+orjson: Any = None
+
+
+def _import_serializers() -> None:
+    """Import the JSON libraries, `orjson` only if it is installed."""
+    global json, orjson
+    if json is not None:
+        return
+    try:
+        import orjson as _orjson
+    except ImportError:  # pragma: no cover
+        _orjson = None
+    import ujson
+    orjson = _orjson
+    json = ujson  # Set last, as it marks the imports as done
+
 
 def touch(path: str, create_dirs: bool) -> None:
     """
@@ -31,7 +61,7 @@ def touch(path: str, create_dirs: bool) -> None:
         base_dir = os.path.dirname(path)
 
         # Check if we need to create missing parent directories
-        os.makedirs(base_dir, exist_ok=True)
+        os.makedirs(base_dir or ".", exist_ok=True)
 
     # Create the file by opening it in 'a' mode which creates the file if it
     # does not exist yet but does not modify its contents
@@ -39,6 +69,224 @@ def touch(path: str, create_dirs: bool) -> None:
         pass
 
 
+def _orjson_option(kwargs: Mapping[str, Any]) -> int | None:
+    """
+    Translate `json.dumps` keyword arguments to `orjson` options.
+
+    Returns `None` if `orjson` is not installed or an argument has no
+    `orjson` equivalent, `ujson` should be used then.
+    """
+    if orjson is None:
+        return None
+    option = 0
+    for k, v in kwargs.items():
+        if k == "indent" and v in (None, 0, 2):
+            option |= orjson.OPT_INDENT_2 if v else 0
+        elif k == "sort_keys":
+            option |= orjson.OPT_SORT_KEYS if v else 0
+        elif k == "ensure_ascii" and not v:
+            pass  # orjson never escapes non-ASCII characters
+        elif k == "default":
+            pass  # Passed to orjson as it is
+        else:
+            return None
+    return option
+
+
+# Maps digits to "0", the other characters of numbers to "." and the rest
+# to " ", integer literals then show up as runs of "0" after a " "
+_NUMBER_CHARS = bytes(48 if 48 <= c <= 57 else 46 if c in b".eE" else 32
+                      for c in range(256))
+_NUMBER_CHARS_STR = {c: _NUMBER_CHARS[c] for c in range(128)}
+_ATOMS = frozenset((str, int, bool, type(None)))
+
+
+def _has_long_ints(raw: str | bytes) -> bool:
+    """
+    Whether `raw` may contain integers of 19 digits or more,
+    which `orjson` reads as `float` if they exceed 64 bits.
+    """
+    if isinstance(raw, str):
+        scanned, run = raw.translate(_NUMBER_CHARS_STR), "0" * 19
+        return scanned.startswith(run) or f" {run}" in scanned
+    scanned, brun = raw.translate(_NUMBER_CHARS), b"0" * 19
+    return scanned.startswith(brun) or b" " + brun in scanned
+
+
+def _has_nonfinite(obj: Any) -> bool:
+    """Whether `obj` contains `NaN` or `Infinity`."""
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, MappingABC):
+            obj = obj.values()
+        elif not isinstance(obj, (list, tuple)):
+            if isinstance(obj, float) and not isfinite(obj):
+                return True
+            continue
+        for value in obj:  # Dispatch on the exact type, the common case
+            kind = type(value)
+            if kind is float:
+                if value - value:  # NaN for both NaN and infinities
+                    return True
+            elif kind not in _ATOMS:
+                stack.append(value)
+    return False
+
+
+def _orjson_dumps(obj: Any, **kwargs) -> bytes:
+    """
+    `orjson.dumps`, raising `TypeError` for `NaN` and `Infinity`
+    rather than writing them as `null`.
+    """
+    dumped = orjson.dumps(obj, **kwargs)
+    if b"null" in dumped and _has_nonfinite(obj):
+        raise TypeError("orjson does not support non-finite floats")
+    return dumped
+
+
+def _loads(raw: str | bytes, exact: bool = False) -> Any:
+    """
+    Deserialize JSON, preferring `orjson` if it is installed.
+
+    `exact` skips looking for integers `orjson` would read as `float`,
+    for output of `orjson` itself, which has none.
+    """
+    if orjson is not None and (exact or not _has_long_ints(raw)):
+        with suppress(ValueError):  # Such as NaN, which orjson rejects
+            return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _dumps_compact(obj: Any) -> bytes:
+    """Serialize JSON on a single line, preferring `orjson` if it is installed."""
+    if orjson is not None:
+        with suppress(TypeError):
+            return _orjson_dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def _fsync_path(path: str) -> None:
+    """Flush a file or directory to the disk, if it can be opened."""
+    flags = os.O_RDONLY if os.path.isdir(path) else os.O_WRONLY
+    try:
+        fd = os.open(path, flags)
+    except OSError:  # Removed since, or a directory on Windows
+        return
+    try:
+        _fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _file_id(path: str | int) -> list[int]:
+    """Identify a version of a file, a replaced file gets a new inode."""
+    st = os.stat(path)
+    return [st.st_ino, st.st_size, st.st_mtime_ns]
+
+
+def _journal_base(header: bytes) -> list[int] | None:
+    """Get the file version a journal applies to from its header."""
+    try:
+        return _loads(header)["base"]
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def _replay(data: dict[str, Any], lines: Sequence[str | bytes]) -> None:
+    """Apply journal records to `data` in place."""
+    for line in lines:
+        try:
+            record = _loads(line)
+        except ValueError:  # Torn write at the end of the journal
+            break
+        for name in record.get("drop", ()):
+            data.pop(name, None)
+        data.update(record.get("put", {}))
+        for name, docs in record.get("set", {}).items():
+            data.setdefault(name, {}).update(docs)
+        for name, doc_ids in record.get("del", {}).items():
+            table = data.get(name, {})
+            for doc_id in doc_ids:
+                table.pop(doc_id, None)
+
+
+_SCALARS = frozenset((str, int, float, bool, type(None)))
+
+
+def _has_str_keys(data: Any) -> bool:
+    """
+    Check whether `data` can be serialized as is,
+    i.e. every mapping in it is a `dict` with only `str` keys.
+    """
+    stack = [data]
+    seen: set[int] = set()
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, dict):
+            if id(obj) in seen:
+                continue
+            seen.add(id(obj))
+            for k in obj:
+                if type(k) is not str:
+                    return False
+            stack.extend(obj.values())
+        elif isinstance(obj, list | tuple):
+            if id(obj) in seen:
+                continue
+            seen.add(id(obj))
+            stack.extend(obj)
+        elif isinstance(obj, MappingABC):
+            return False
+    return True
+
+
+def _stringify_keys(data: Any) -> Any:
+    """
+    Convert all keys to `str`, returning `data` itself if they already are.
+
+    Mappings are copied to `dict`s, lists and tuples to `list`s,
+    except flat `dict`s that have nothing to convert, which are shared.
+    Shared and circular references are kept as they are.
+    """
+    if _has_str_keys(data):
+        return data
+    _str, _isinstance, _id, _type = str, isinstance, id, type
+    is_str, is_scalar = frozenset((str,)).issuperset, _SCALARS.issuperset
+    containers = (MappingABC, list, tuple)
+    memo: dict[int, Any] = {}
+    root: list[Any] = [data]
+    # Each entry is a container whose slot `parent[key]` holds
+    # the original object, to be replaced by its converted copy
+    stack: list[tuple[Any, Any]] = [(root, 0)]
+    pop, push = stack.pop, stack.append
+    while stack:
+        parent, key = pop()
+        obj = parent[key]
+        out = memo.get(_id(obj))
+        if out is None:
+            if _isinstance(obj, MappingABC):
+                out = {_str(k): v for k, v in obj.items()}
+                children: Any = out.items()
+            else:
+                out = list(obj)
+                children = enumerate(out)
+            memo[_id(obj)] = out
+            for k, v in children:
+                # `isinstance` against an ABC is slow, rule out scalars first
+                if _type(v) in _SCALARS:
+                    continue
+                # Documents are usually flat dicts with `str` keys,
+                # checked at C speed and shared instead of copied
+                if _isinstance(v, dict) and is_str(map(_type, v)) \
+                        and is_scalar(map(_type, v.values())):
+                    continue
+                if _isinstance(v, containers):
+                    push((out, k))
+        parent[key] = out
+    return root[0]
+
+
 class Storage(ABC):
     """
     The abstract base class for all Storages.
@@ -100,6 +348,21 @@ class Storage(ABC):
 
         raise NotImplementedError('To be overridden!')
 
+    def mark_clean(self, name: str) -> None:
+        """
+        Optional: Note that table `name` is passed to the very next write as
+        the same object, unchanged since the last write, so a serialized copy
+        of it kept from the last write may be reused.
+        """
+
+    def is_current(self, data: Mapping) -> bool:
+        """
+        Optional: Whether `data` is the very object last written through this
+        storage, and nothing has been written to the storage since by anyone,
+        so that it can be used instead of reading the storage again.
+        """
+        return False
+
     async def close(self) -> None:
         """
         Optional: Close open file handles, etc.
@@ -124,10 +387,19 @@ class StorageWithWriteReadPrePostHooks(Storage):
 class JSONStorage(StorageWithWriteReadPrePostHooks):
     """
     Store the data in a JSON file.
+
+    Uses `orjson` when it is installed and the file is binary or UTF-8,
+    falling back to `ujson` for other encodings, and for data or keyword
+    arguments `orjson` does not support, including integers
+    beyond 64 bits and `NaN`/`Infinity`.
+    Tables marked with :meth:`mark_clean` right before a write are not
+    serialized again if they are the same objects as last written, as a
+    table marks the others when it reuses the database it last wrote.
     """
 
     def __init__(self, path: str, create_dirs=False,
-                 encoding=None, access_mode="r+", **kwargs):
+                 encoding=None, access_mode="r+", journal=False,
+                 durable=False, **kwargs):
         """
         Create a new instance.
 
@@ -139,12 +411,23 @@ class JSONStorage(StorageWithWriteReadPrePostHooks):
         * `encoding`: The encoding to use when reading/writing the file.
         * `access_mode`: mode in which the file is opened
          (r, r+, w, a, x, b, t, +, U)
+        * `journal`: Append changed documents to `<path>.wal` instead of
+         rewriting the whole file, which is compacted once the journal
+         outgrows it. With `write.post`/`read.pre` hooks bound (e.g.
+         compression or encryption), each record goes through them too.
+        * `durable`: Flush every write to the disk before it completes.
+         Otherwise the file is still flushed before it replaces the old
+         one, so a crash never leaves it empty or truncated, but the
+         directory and journal records are only flushed on `close`,
+         so the last writes may be lost on a power failure.
         """
 
         super().__init__()
 
+        _import_serializers()
         self._mode = access_mode
         self.kwargs = kwargs
+        self._orjson_default = kwargs.get("default")
 
         if encoding is None and 'b' not in self._mode:
             encoding = "utf-8"
@@ -153,8 +436,38 @@ class JSONStorage(StorageWithWriteReadPrePostHooks):
         self._closed = False
         self._path = path
         self._encoding = encoding
+        # UTF-8 bytes from the serializer can be written as they are
+        self._utf8 = encoding is not None \
+            and codecs.lookup(encoding).name == "utf-8"
+        # Translated once, rather than on every write. orjson writes
+        # non-ASCII characters as they are, ujson escapes them for the
+        # encodings that may not hold them
+        self._orjson_option = _orjson_option(kwargs) \
+            if 'b' in self._mode or self._utf8 else None
         self._create_dirs = create_dirs
         self._sink = AsinkRunner()
+        self._journal = journal
+        self._durable = durable
+        self._unsynced: set[str] = set()
+        """Files and directories written without flushing them since"""
+        self._journal_path = f"{os.fspath(path)}.wal"
+        self._snapshot: dict[str, Any] = {}
+        """Serialized tables or documents as last written"""
+        self._compact = True
+        """Whether the next write should rewrite the whole file"""
+        self._pending: list[tuple[bool, str | bytes]] = []
+        """Full writes and journal records waiting to be written, in order"""
+        self._pending_lock = threading.Lock()
+        self._fragments: dict[str, tuple[Any, bytes]] = {}
+        """Tables as last written and their serialized form"""
+        self._clean: set[str] = set()
+        """Tables the next write may reuse the last serialized form of"""
+        self._written: tuple[int, list[int]] | None = None
+        """The payload of the last full write and the file it made"""
+        self._current: tuple[int, list[int]] | None = None
+        """The data of the last write and the file it made, see `is_current`"""
+        self._exact: list[int] | None = None
+        """The last file written with `orjson` output, see `_loads`"""
 
         # Initialize event hooks
 
@@ -180,90 +493,389 @@ class JSONStorage(StorageWithWriteReadPrePostHooks):
     def closed(self) -> bool:
         return self._closed
 
+    def mark_clean(self, name: str) -> None:
+        self._clean.add(name)
+
+    def is_current(self, data: Mapping) -> bool:
+        current = self._current
+        if current is None or current[0] != id(data) or self._journal:
+            return False
+        hooks = self._event_hook
+        if hooks["write.pre"] or hooks["read.post"]:
+            return False  # What is read back may differ from what was written
+        try:
+            return _file_id(self._path) == current[1]
+        except OSError:
+            return False
+
     async def close(self) -> None:
         if not self.closed:
             await self._prep()
+            if self._unsynced:
+                await self._sink.run(self._sync)
             await self._sink.aclose()
             self._closed = True
             await self._event_hook.aemit("close", self)
 
     async def read(self) -> dict[str, Any] | None:
         """Read data from the storage."""
-        await self._prep()
+        await self._prep(touch=False)
 
         # Load the JSON contents of the file
-        raw: str | bytes = await self._sink.run(self._atomic_read)
+        journal: list[bytes] = []
+        if self._journal:
+            raw, file, journal = await self._sink.run(
+                self._atomic_read_journaled)
+        else:
+            raw, file = await self._sink.run(self._atomic_read)
 
         if not raw:
             return None
 
-        # Pre-process data
-        pre = cast(str | bytes | None,
-                   await self._event_hook.aemit("read.pre", self, raw))
-        raw = pre if pre is not None else raw or "{}"
-
-        # Deserialize the data
-        data = await self._sink.run(json.loads, raw)
+        # Pre-process data, without scheduling anything if there are no hooks
+        hooks = self._event_hook
+        if hooks["read.pre"]:
+            pre = cast(str | bytes | None,
+                       await hooks.aemit("read.pre", self, raw))
+            raw = pre if pre is not None else raw or "{}"
+
+        # Deserialize the data, a thread hop costs more than parsing small data
+        exact = file == self._exact and not hooks["read.pre"]
+        if len(raw) < _OFFLOAD_THRESHOLD:
+            data = _loads(raw, exact)
+        else:
+            data = await self._sink.run(_loads, raw, exact)
+        if journal:
+            records: Sequence[str | bytes] = journal
+            if hooks["read.pre"]:
+                records = await self._unseal(journal)
+            _replay(data, records)
 
         # Post-process data
-        post = await self._event_hook.aemit("read.post", self, data)
-        data = post if post is not None else data
+        if hooks["read.post"]:
+            post = await hooks.aemit("read.post", self, data)
+            data = post if post is not None else data
         return data
 
     async def write(self, data: Mapping):
         """Write data to the storage."""
-        await self._prep()
-
-        # Pre-process data
-        pre = cast(Mapping | None,
-                   await self._event_hook.aemit("write.pre", self, data))
-        data = pre if pre is not None else data
-        # Convert keys to strings
-        data = stringify_keys(data)
-
-        # Serialize the database state using the user-provided arguments
-        serialized: bytes | str = json.dumps(data or {}, **self.kwargs)
+        clean, self._clean = self._clean, set()
+        await self._prep(touch=False)
+        self._current = None
+        written = data
+
+        # Pre-process data, without scheduling anything if there are no hooks
+        hooks = self._event_hook
+        serialized: str | bytes | None = None
+        if hooks["write.pre"]:
+            pre = cast(Mapping | None,
+                       await hooks.aemit("write.pre", self, data))
+            data = pre if pre is not None else data
+        elif clean and not self._journal and self._orjson_option == 0:
+            # Only tables not marked clean are serialized
+            serialized = self._dumps_tables(data, clean)
+        if serialized is None:
+            self._fragments = {}
+
+            # Convert keys to strings
+            data = _stringify_keys(data)
+
+            if self._journal and not self._compact:
+                await self._write_journal(data)
+                return
+
+            # Serialize the database state using the user-provided arguments
+            serialized = self._dumps(data or {})
+        # Bytes only come from `orjson`
+        exact = isinstance(serialized, bytes) and not hooks["write.post"]
+
+        # Match the type expected by the access mode
+        if 'b' in self._mode:
+            if isinstance(serialized, str):
+                serialized = serialized.encode("utf-8")
+        elif isinstance(serialized, bytes) \
+                and (hooks["write.post"] or not self._utf8):
+            serialized = serialized.decode("utf-8")
 
         # Post-process the serialized data
-        if 'b' in self._mode and isinstance(serialized, str):
-            serialized = serialized.encode("utf-8")
-        post: str | bytes | None = await self._event_hook.aemit(  # type: ignore
-            "write.post", self, serialized)
-        serialized = post if post is not None else serialized
-
-        # Write the serialized data to the file
+        if hooks["write.post"]:
+            post: str | bytes | None = await hooks.aemit(  # type: ignore
+                "write.post", self, serialized)
+            serialized = post if post is not None else serialized
+
+        if self._journal:
+            # Start the next journal from this state, before anything else
+            # can be queued, so journal records follow the file they apply to
+            self._diff(data)
+            self._compact = False
+
+        # Write the serialized data to the file.
+        # Nothing above holds a lock, only the file writes are serialized,
+        # by the order in which they are queued on the sink.
+        # Writes still queued when a newer one arrives are skipped.
         try:
-            await self._sink.run(self._atomic_write, serialized)
+            if await self._flush(True, serialized):
+                self._compact = True
         except io.UnsupportedOperation as e:
+            self._compact = True
             raise IOError(
                 f"Cannot write to the file. Access mode is '{self._mode}'") from e
+        except BaseException:
+            self._compact = True
+            raise
+        # Unless a later write has superseded this one, it is what the file
+        # holds, the payload is still alive so its id can't have been reused
+        last = self._written
+        if last is not None and last[0] == id(serialized):
+            self._current = (id(written), last[1])
+            self._exact = last[1] if exact else None
+
+    async def _write_journal(self, data: Mapping):
+        """Append the changes since the last write to the journal."""
+        try:
+            record = self._diff(data)
+            if not record:
+                return
+            line = _dumps_compact(record)
+            if self._event_hook["write.post"]:
+                line = await self._seal(line)
+            if await self._flush(False, line):
+                self._compact = True
+        except BaseException:
+            self._compact = True  # The snapshot may be out of sync
+            raise
+
+    async def _seal(self, line: bytes) -> bytes:
+        """
+        Post-process a journal record like the file itself,
+        framed as a base64 line, told apart from plain records by not
+        starting with `{`.
+        """
+        data: str | bytes = line if 'b' in self._mode else line.decode("utf-8")
+        post = await self._event_hook.aemit("write.post", self, data)
+        data = post if post is not None else data
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        return b2a_base64(data, newline=False)
+
+    async def _unseal(self, lines: list[bytes]) -> list[str | bytes]:
+        """Pre-process the journal records sealed by :meth:`_seal`."""
+        hooks = self._event_hook
+        out: list[str | bytes] = []
+        for line in lines:
+            if line.startswith(b"{"):
+                out.append(line)
+                continue
+            try:
+                raw: str | bytes = a2b_base64(line)
+                if 'b' not in self._mode:
+                    raw = raw.decode("utf-8")
+                pre = await hooks.aemit("read.pre", self, raw)
+            except Exception:  # Torn write at the end of the journal
+                break
+            out.append(pre if pre is not None else raw)
+        return out
+
+    async def _flush(self, full: bool, data: str | bytes) -> bool:
+        """
+        Queue a full write (`full=True`) or a journal record,
+        returning whether the journal has outgrown the file.
+        """
+        with self._pending_lock:
+            self._pending.append((full, data))
+        return await self._sink.run(self._atomic_flush)
+
+    def _diff(self, data: Mapping) -> dict[str, Any]:
+        """
+        Compare `data` with the snapshot of the last write,
+        returning a journal record of the changes and updating the snapshot.
+        """
+        dumps = _dumps_compact if orjson is None else _orjson_dumps
+        old = self._snapshot
+        new: dict[str, Any] = {}
+        record: dict[str, Any] = {}
+        for name, table in data.items():
+            prev = old.get(name)
+            if not isinstance(table, dict):
+                new[name] = dumped = _dumps_compact(table)
+                if dumped != prev:
+                    record.setdefault("put", {})[name] = table
+                continue
+            try:  # Avoid calling the wrapper once per document
+                docs = {k: dumps(v) for k, v in table.items()}
+            except TypeError:
+                docs = {k: _dumps_compact(v) for k, v in table.items()}
+            new[name] = docs
+            if not isinstance(prev, dict):
+                record.setdefault("put", {})[name] = table
+                continue
+            changed = {k: table[k] for k, v in docs.items() if prev.get(k) != v}
+            deleted = [k for k in prev if k not in docs]
+            if changed:
+                record.setdefault("set", {})[name] = changed
+            if deleted:
+                record.setdefault("del", {})[name] = deleted
+        dropped = [name for name in old if name not in data]
+        if dropped:
+            record["drop"] = dropped
+        self._snapshot = new
+        return record
+
+    def _dumps_tables(self, data: Mapping, clean: set[str]) -> bytes | None:
+        """
+        Serialize `data` table by table, reusing the output of the last write
+        for tables marked clean that are the same objects.
 
-    async def _prep(self):
+        Returns `None` if `data` cannot be serialized this way.
+        """
+        if not isinstance(data, dict):
+            return None
+        dumps, default = _orjson_dumps, self._orjson_default
+        old = self._fragments
+        new: dict[str, tuple[Any, bytes]] = {}
+        parts: list[bytes] = []
+        try:
+            for name, table in data.items():
+                if type(name) is not str:
+                    return None
+                last = old.get(name)
+                if last is not None and last[0] is table and name in clean:
+                    dumped = last[1]
+                else:
+                    dumped = dumps(_stringify_keys(table), default=default)
+                new[name] = (table, dumped)
+                parts.append(dumps(name) + b":" + dumped)
+        except TypeError:  # Such as big ints or NaN, use ujson instead
+            return None
+        self._fragments = new
+        return b"{" + b",".join(parts) + b"}"
+
+    def _dumps(self, data: Mapping) -> str | bytes:
+        """Serialize JSON, preferring `orjson` if it is installed."""
+        option = self._orjson_option
+        if option is not None:
+            with suppress(TypeError):  # Such as big ints or NaN, use ujson instead
+                return _orjson_dumps(data, default=self._orjson_default,
+                                     option=option)
+        return json.dumps(data, **self.kwargs)
+
+    async def _prep(self, touch=True):
         if self.closed:
             raise IOError("Storage is closed")
+        if touch:
+            await self._sink.run(self._touch)
+
+    def _touch(self):
         # Create the file if it doesn't exist and creating is allowed by the
         # access mode
         if any(character in self._mode for character in ('+', 'w', 'a')):
-            await self._sink.run(touch, self._path, create_dirs=self._create_dirs)
+            touch(self._path, create_dirs=self._create_dirs)
+
+    def _atomic_read(self) -> tuple[str | bytes, list[int]]:
+        """Read data from the file, and the `_file_id` of what was read."""
+        try:
+            f = open(self._path, mode=self._mode, encoding=self._encoding)
+        except FileNotFoundError:
+            # Only look after the file when it is missing, rather than
+            # touching it on every read
+            self._touch()
+            f = open(self._path, mode=self._mode, encoding=self._encoding)
+        with f:
+            return f.read(), _file_id(f.fileno())
+
+    def _atomic_read_journaled(self) -> tuple[str | bytes, list[int], list[bytes]]:
+        """
+        Read data from the file, the `_file_id` of what was read,
+        and the journal records that apply to it.
+        """
+        raw, file = self._atomic_read()
+        try:
+            with open(self._journal_path, "rb") as f:
+                header = f.readline()
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return raw, file, []
+        # A journal left over from before the last compaction is stale
+        if _journal_base(header) == _file_id(self._path):
+            return raw, file, lines
+        return raw, file, []
+
+    def _atomic_flush(self) -> bool:
+        """
+        Carry out everything pending, returning whether the journal
+        has outgrown the file.
 
-    def _atomic_read(self):
-        """Read data from the file."""
-        with open(self._path, mode=self._mode, encoding=self._encoding) as f:
-            return f.read()
+        The sink does not keep jobs of the same priority in order,
+        so each job takes all the work pending so far, in order,
+        and later jobs may find nothing left to do.
+        A full write supersedes everything pending before it.
+        """
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        try:
+            full, lines = None, []
+            for is_full, data in pending:
+                if is_full:
+                    full, lines = data, []
+                else:
+                    lines.append(data)
+            if full is not None:
+                self._atomic_write(full)
+            return bool(lines) and self._atomic_append(lines)
+        except BaseException:
+            with self._pending_lock:  # Let the next job retry
+                self._pending[:0] = pending
+            raise
+
+    def _atomic_append(self, lines: list[bytes]) -> bool:
+        """
+        Append records to the journal,
+        returning whether the journal has outgrown the file.
+        """
+        base = _file_id(self._path)
+        with open(self._journal_path, "ab+") as f:
+            stale = True
+            if f.tell():
+                f.seek(0)
+                stale = _journal_base(f.readline()) != base
+                if stale:
+                    # The file was replaced by someone else,
+                    # apply the records to it from now on
+                    f.truncate(0)
+            if stale:
+                f.write(_dumps_compact({"base": base}) + b"\n")
+            f.writelines(line + b"\n" for line in lines)
+            f.flush()
+            if self._durable:
+                _fsync(f.fileno())
+            else:
+                self._unsynced.add(self._journal_path)
+            return f.tell() > os.path.getsize(self._path)
 
     def _atomic_write(self, data):
-        # Open the temp file
-        with NamedTemporaryFile(mode=self._mode, encoding=self._encoding,
-                                delete=False) as f:
+        # Open the temp file next to the database, so that `os.replace`
+        # stays on the same file system and does not fall back to copying
+        mode, encoding = self._mode, self._encoding
+        if isinstance(data, bytes | bytearray) and 'b' not in mode \
+                and self._utf8:
+            # Encoded UTF-8 already, skip decoding and encoding it again
+            mode, encoding = mode.replace('t', '') + 'b', None
+        temp = partial(NamedTemporaryFile, mode=mode, encoding=encoding,
+                       dir=os.path.dirname(self._path) or None, delete=False)
+        try:
+            f = temp()
+        except FileNotFoundError:  # Missing parent directories
+            self._touch()
+            f = temp()
+        self._written = None
+        with f:
             f.write(data)
 
-            # Remove data that is behind the new cursor in case the file has
-            # gotten shorter
-            f.truncate()
-
-            # Ensure the file has been written
+            # Ensure the file has been written before it replaces the old one
             f.flush()
-            os.fsync(f.fileno())
+            _fsync(f.fileno())
+            # Taken from the open file, someone may replace it right after
+            written = _file_id(f.fileno())
             f.close()
 
             # Use os.replace to ensure atomicity
@@ -272,6 +884,23 @@ class JSONStorage(StorageWithWriteReadPrePostHooks):
             except OSError:
                 shutil.copy(f.name, self._path)
                 os.remove(f.name)
+            else:
+                self._written = (id(data), written)
+
+        # The new directory entry, so the replacement survives a crash
+        parent = os.path.dirname(self._path) or "."
+        if self._durable:
+            _fsync_path(parent)
+        else:
+            self._unsynced.add(parent)
+        if self._journal:
+            with suppress(FileNotFoundError):
+                os.remove(self._journal_path)
+
+    def _sync(self):
+        """Flush what non-durable writes left unflushed to the disk."""
+        while self._unsynced:
+            _fsync_path(self._unsynced.pop())
 
     def __del__(self):
         try:
@@ -343,19 +972,25 @@ class MemoryStorage(Storage):
     Store the data in memory.
     """
 
-    def __init__(self):
+    def __init__(self, copy_on_read=False):
         """
         Create a new instance.
+
+        * `copy_on_read`: Return a deep copy of the data on every read,
+         so that changes to it do not reach the storage until written back.
         """
 
         super().__init__()
         self.memory = None
+        self._copy_on_read = copy_on_read
 
     @property
     def closed(self) -> bool:
         return False
 
     async def read(self) -> MutableMapping[str, Any] | None:
+        if self._copy_on_read:
+            return deepcopy(self.memory)
         return self.memory
 
     async def write(self, data: Mapping):
@@ -8,16 +8,19 @@ from abc import ABC, abstractmethod
 from contextlib import suppress
 import inspect
 import uuid
+from types import MappingProxyType
 import json  # For pretty printing
 import asyncio
-from copy import deepcopy
+from itertools import islice
 from typing import AsyncGenerator, Collection, Coroutine, MutableMapping
 from typing import overload, Callable, Iterable
 from typing import Mapping, Generic, cast, TypeVar, Type, Any, ParamSpec
+from collections.abc import Mapping as MappingABC  # Faster `isinstance`
+from collections.abc import ItemsView, Iterator, ValuesView
 from .queries import QueryLike, is_cacheable
-from vermils.react import EventHook, EventHint, ActionChain
+from .event_hooks import ActionChain, EventHook, EventHint
 from .storages import Storage
-from .utils import LRUCache
+from .utils import LRUCache, fast_deepcopy
 from vermils.asynctools import sync_await
 
 __all__ = ("Document", "Table", "IncreID")
@@ -26,6 +29,15 @@ DocVar = TypeVar("DocVar", bound="BaseDocument")
 ARGS = ParamSpec("ARGS")
 V = TypeVar("V")
 
+_MAX_BATCH = 2000
+"""The most updaters :meth:`Table._update_table` applies with one write."""
+_PendingUpdate = tuple[Callable, "Collection[Any] | None", bool, asyncio.Future]
+"""An updater, the IDs it changes, whether they are appended, its future."""
+_EMPTY: Mapping[Any, Mapping] = MappingProxyType({})
+"""The raw data of a table missing from the database, read-only and shared."""
+_ABSENT: Any = object()
+"""Marks a document that did not exist before an update."""
+
 
 class BaseID(ABC):
     """
@@ -71,8 +83,11 @@ class BaseID(ABC):
 
 
 class IncreID(int, BaseID):
-    """ID class using incrementing integers."""
-    _cache: dict[str, int] = {}
+    """
+    ID class using incrementing integers.
+
+    The counter lives on the table itself, see ``Table._max_id``.
+    """
 
     __init__ = int.__init__
 
@@ -81,35 +96,25 @@ class IncreID(int, BaseID):
 
     @classmethod
     def next_id(cls, table: Table, keys: Collection[IncreID]) -> IncreID:
-        # If we already know the next ID
-        if table.name in cls._cache:
-            new = cls(cls._cache[table.name])
-            cls._cache[table.name] += 1
-            return new
-
-        # If the table is empty, set the initial ID
-        if not keys:
-            next_id = 1
-            cls._cache[table.name] = next_id + 1
-            return cls(next_id)
-
-        # Determine the next ID based on the maximum ID that's currently in use
-        max_id = max(keys)
-        next_id = max_id + 1
-
-        # The next ID we wil return AFTER this call needs to be larger than
-        # the current next ID we calculated
-        cls._cache[table.name] = next_id + 1
-        return cls(next_id)
+        max_id = table._max_id
+        if max_id is None:
+            # Determine the next ID based on the maximum ID that's currently
+            # in use, only once per table, or start from 1 if it is empty
+            max_id = max(keys) if keys else 0
+
+        table._max_id = max_id = max_id + 1
+        return cls(max_id)
 
     @classmethod
     def mark_existed(cls, table: Table, new_id: IncreID):
-        cls._cache[table.name] = max(
-            cls._cache.get(table.name, 0), int(new_id) + 1)
+        # While the counter is unknown, it will be derived from the table
+        # which then holds this ID as well
+        if table._max_id is not None and new_id > table._max_id:
+            table._max_id = int(new_id)
 
     @classmethod
     def clear_cache(cls, table: Table):
-        cls._cache.pop(table.name, None)
+        table._max_id = None
 
 
 class StrID(str, BaseID):
@@ -137,7 +142,10 @@ class UUID(uuid.UUID, BaseID):
     """ID class using uuid4 UUIDs."""
 
     def __init__(self, value: str | uuid.UUID):  # skipcq: PYL-W0231
-        super().__init__(str(value))
+        if isinstance(value, uuid.UUID):  # No need to format and parse again
+            super().__init__(int=value.int)
+        else:
+            super().__init__(str(value))
 
     def __hash__(self):
         return uuid.UUID.__hash__(self)
@@ -156,6 +164,8 @@ class UUID(uuid.UUID, BaseID):
 
 
 class BaseDocument(MutableMapping[IDVar, Any]):
+    __slots__ = ()
+
     @property
     @abstractmethod
     def doc_id(self) -> IDVar:
@@ -174,9 +184,11 @@ class Document(dict, BaseDocument[IDVar]):
     its ID using ``doc.doc_id``.
     """
 
+    __slots__ = ("_doc_id",)  # No ``__dict__`` for every document
+
     def __init__(self, value: Mapping, doc_id: IDVar):
-        super().__init__(value)
-        self.doc_id = doc_id
+        dict.__init__(self, value)
+        self._doc_id = doc_id  # Skip the property, this runs once per row
 
     @property
     def doc_id(self) -> IDVar:
@@ -191,6 +203,154 @@ class Document(dict, BaseDocument[IDVar]):
         return f"Document(\n  doc_id={self.doc_id} \n  doc={pp})"
 
 
+class _LazyTable(MutableMapping[IDVar, DocVar]):
+    """
+    Table data that wraps raw documents into the document class only once
+    they are accessed, for tables that are read again on every operation.
+    """
+
+    def __init__(self, raw: Mapping[Any, Mapping],
+                 id_cls: Type[IDVar], doc_cls: Type[DocVar]):
+        self._raw: dict[IDVar, Mapping] = {
+            id_cls(doc_id): rdoc for doc_id, rdoc in raw.items()}
+        self._docs: dict[IDVar, DocVar] = {}
+        self._id_cls = id_cls
+        self._doc_cls = doc_cls
+
+    def __getitem__(self, doc_id: IDVar) -> DocVar:
+        doc = self._docs.get(doc_id)
+        if doc is None:
+            rdoc = self._raw[doc_id]
+            doc_id = self._id_cls(doc_id)
+            doc = self._docs[doc_id] = self._doc_cls(rdoc, doc_id=doc_id)
+        return doc
+
+    def __setitem__(self, doc_id: IDVar, doc: DocVar) -> None:
+        self._raw[doc_id] = self._docs[doc_id] = doc
+
+    def __delitem__(self, doc_id: IDVar) -> None:
+        del self._raw[doc_id]
+        self._docs.pop(doc_id, None)
+
+    def __contains__(self, doc_id: object) -> bool:
+        return doc_id in self._raw
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def __len__(self) -> int:
+        return len(self._raw)
+
+    def clear(self) -> None:
+        self._raw.clear()
+        self._docs.clear()
+
+    def _iter_items(self) -> Iterator[tuple[IDVar, DocVar]]:
+        docs, doc_cls = self._docs, self._doc_cls
+        for doc_id, rdoc in self._raw.items():
+            doc = docs.get(doc_id)
+            if doc is None:
+                doc = docs[doc_id] = doc_cls(rdoc, doc_id=doc_id)
+            yield doc_id, doc
+
+    def items(self) -> ItemsView[IDVar, DocVar]:
+        return _LazyItems(self)
+
+    def values(self) -> ValuesView[DocVar]:
+        return _LazyValues(self)
+
+    def to_dict(self) -> dict[IDVar, Mapping]:
+        """The table data to be written, without wrapping the rest."""
+        docs = self._docs
+        return {doc_id: docs.get(doc_id, rdoc)
+                for doc_id, rdoc in self._raw.items()}
+
+
+class _LazyItems(ItemsView):
+    _mapping: _LazyTable
+
+    def __iter__(self):
+        return self._mapping._iter_items()
+
+
+class _LazyValues(ValuesView):
+    _mapping: _LazyTable
+
+    def __iter__(self):
+        return (doc for _, doc in self._mapping._iter_items())
+
+
+class _UndoLog(MutableMapping[IDVar, DocVar]):
+    """
+    Table data that remembers the documents changed through it, so that the
+    changes of an updater that fails can be undone without touching those of
+    the other updaters in its batch.
+
+    Documents are only copied when they are about to be modified in place,
+    see `modify`, reading them through this costs nothing.
+    """
+
+    def __init__(self, table: MutableMapping[IDVar, DocVar]):
+        self._table = table
+        self._saved: dict[IDVar, tuple[Any, Any]] = {}
+        """The documents as they were, and a copy of their contents
+        if they were modified in place."""
+        self._order: list[IDVar] | None = None
+        """The order of the documents before the first one was deleted"""
+
+    def modify(self, doc_id: IDVar) -> DocVar:
+        """Get a document that is about to be modified in place."""
+        doc = self._table[doc_id]
+        if doc_id not in self._saved:
+            self._saved[doc_id] = (doc, fast_deepcopy(doc))
+        return doc
+
+    def __getitem__(self, doc_id: IDVar) -> DocVar:
+        return self._table[doc_id]
+
+    def __setitem__(self, doc_id: IDVar, doc: DocVar) -> None:
+        if doc_id not in self._saved:
+            self._saved[doc_id] = (self._table.get(doc_id, _ABSENT), None)
+        self._table[doc_id] = doc
+
+    def __delitem__(self, doc_id: IDVar) -> None:
+        table = self._table
+        if self._order is None:
+            self._order = list(table)
+        if doc_id not in self._saved:
+            self._saved[doc_id] = (table[doc_id], None)
+        del table[doc_id]
+
+    def __contains__(self, doc_id: object) -> bool:
+        return doc_id in self._table
+
+    def __iter__(self):
+        return iter(self._table)
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def undo(self) -> None:
+        """Put the documents changed through this back as they were."""
+        table = self._table
+        for doc_id, (doc, contents) in self._saved.items():
+            if doc is _ABSENT:
+                table.pop(doc_id, None)
+                continue
+            if contents is not None:  # Keep it the same object
+                doc.clear()
+                doc.update(contents)
+            table[doc_id] = doc
+        if self._order is not None:
+            # Deleted documents were put back last, restore their positions
+            docs = dict(table)
+            table.clear()
+            table.update((doc_id, docs[doc_id])
+                         for doc_id in self._order if doc_id in docs)
+        self._saved.clear()
+        self._order = None
+
+
 class Table(Generic[IDVar, DocVar]):
     """
     Represents a single TinyDB table.
@@ -266,15 +426,28 @@ class Table(Generic[IDVar, DocVar]):
         self._name = name
         self._cache: MutableMapping[IDVar, DocVar] | None = None
         """Cache for documents in this table."""
-        self._query_cache: LRUCache[QueryLike, tuple[IDVar, ...]] \
+        self._query_cache: LRUCache[QueryLike, tuple[
+            MutableMapping[IDVar, DocVar], dict[IDVar, DocVar]]] \
             = self.query_cache_class(capacity=cache_size)
-        """Cache for query results in this table."""
+        """Cache for query results in this table,
+        along with the table data they were computed from."""
 
-        self.document_id_class.clear_cache(self)  # clear the ID cache
+        self._max_id: int | None = None
+        """The largest ID handed out by :class:`IncreID`, if known."""
+        # Bind the ID class hooks once, they run on every insert
+        self._next_id = document_id_class.next_id
+        self._mark_existed = document_id_class.mark_existed
+        self._clear_id_cache = document_id_class.clear_cache
+        self._clear_id_cache(self)  # clear the ID cache
 
         self._isolevel = 0
         self._closed = False
         self._lock = asyncio.Lock()
+        self._pending_updates: list[_PendingUpdate] = []
+        """Updaters waiting to be applied by the next table update."""
+        self._written: MutableMapping[Any, Mapping] | None = None
+        """The database as last written by this table, to be reused by
+        the next update while the storage still holds it."""
         self._query_cache_clear_flag = False
         self._data_cache_clear_flag = False
 
@@ -331,10 +504,11 @@ class Table(Generic[IDVar, DocVar]):
         """
 
         # Make sure the document implements the ``Mapping`` interface
-        if not isinstance(document, Mapping):
+        if not isinstance(document, MappingABC):
             raise ValueError("Document is not a Mapping")
 
         doc_id: IDVar = None  # type: ignore
+        inserted: list[IDVar] = []
 
         def updater(table: MutableMapping[IDVar, DocVar]):
             # Now, we update the table and add the document
@@ -351,20 +525,21 @@ class Table(Generic[IDVar, DocVar]):
 
                 # We also mark the ID as existing to prevent it from being
                 # generated again
-                self.document_id_class.mark_existed(self, doc_id)
+                self._mark_existed(self, doc_id)
             else:
                 # For other objects we generate a new ID
-                doc_id = self._get_next_id(table.keys())
+                doc_id = self._next_id(self, table.keys())
 
             # If isolevel is higher than 2, deep copy the document
             if self._isolevel >= 2:
-                document = deepcopy(document)
+                document = fast_deepcopy(document)
             doc = self.document_class(document, doc_id)
             self.event_hook.emit("create", self, doc)
+            inserted.append(doc_id)
             table[doc_id] = doc
 
         # See below for details on ``Table._update``
-        await self._update_table(updater)
+        await self._update_table(updater, inserted, appended=True)
 
         return doc_id
 
@@ -380,16 +555,23 @@ class Table(Generic[IDVar, DocVar]):
 
         def updater(table: MutableMapping[IDVar, DocVar]):
             existing_keys = table.keys()
+            # Look these up once rather than per document
+            doc_cls, id_cls = self.document_class, self.document_id_class
+            next_id, mark_existed = self._next_id, self._mark_existed
+            isolated = self._isolevel >= 2
+            # An empty chain stays empty, no actions run during the loop
+            emit = self.event_hook.emit if self.event_hook["create"] else None
+            append = doc_ids.append
             for document in documents:
 
                 # Make sure the document implements the ``Mapping`` interface
-                if not isinstance(document, Mapping):
+                if not isinstance(document, MappingABC):
                     raise ValueError("Document is not a Mapping")
 
-                if self._isolevel >= 2:
-                    document = deepcopy(document)
+                if isolated:
+                    document = fast_deepcopy(document)
 
-                if isinstance(document, self.document_class):
+                if isinstance(document, doc_cls):
                     # Check if document does not override an existing document
                     if document.doc_id in table:
                         raise ValueError(
@@ -400,19 +582,21 @@ class Table(Generic[IDVar, DocVar]):
                     # Store the doc_id, so we can return all document IDs
                     # later. Then save the document with its doc_id and
                     # skip the rest of the current loop
-                    doc_id = self.document_id_class(document.doc_id)
+                    doc_id = id_cls(document.doc_id)
+                    mark_existed(self, doc_id)
                 else:
                     # Generate new document ID for this document
                     # Store the doc_id, so we can return all document IDs
                     # later, then save the document with the new doc_id
-                    doc_id = self._get_next_id(existing_keys)
-                doc_ids.append(doc_id)
-                new_doc = self.document_class(document, doc_id)
-                self.event_hook.emit("create", self, new_doc)
+                    doc_id = next_id(self, existing_keys)
+                append(doc_id)
+                new_doc = doc_cls(document, doc_id)
+                if emit is not None:
+                    emit("create", self, new_doc)
                 table[doc_id] = new_doc
 
         # See below for details on ``Table._update``
-        await self._update_table(updater)
+        await self._update_table(updater, doc_ids, appended=True)
 
         return doc_ids
 
@@ -445,6 +629,15 @@ class Table(Generic[IDVar, DocVar]):
         """
 
         table = await self._read_table()
+        if cond is None and doc_ids is None and (
+                limit is None or limit >= len(table)):
+            # Everything is returned, no need to build a dict in between
+            docs = list(table.values())
+            if self.event_hook["read"]:
+                for doc in docs:
+                    self.event_hook.emit("read", self, doc)
+            return fast_deepcopy(docs) if self._isolevel >= 2 else docs
+
         ret = self._search(cond, table, limit, doc_ids)
         return list(ret.values())
 
@@ -468,6 +661,15 @@ class Table(Generic[IDVar, DocVar]):
             raise ValueError("You have to pass either cond or doc_id")
 
         table = await self._read_table()
+        if cond is None:
+            # A plain lookup by ID, no need for the search machinery
+            doc = table.get(doc_id)  # type: ignore
+            if doc is None:
+                return None
+            if self.event_hook["read"]:
+                self.event_hook.emit("read", self, doc)
+            return fast_deepcopy(doc) if self._isolevel >= 2 else doc
+
         doc_ids = None if doc_id is None else (doc_id,)
         ret = self._search(cond, table, 1, doc_ids)
         if ret:
@@ -490,6 +692,9 @@ class Table(Generic[IDVar, DocVar]):
         """
         if cond is None and doc_id is None:
             raise ValueError("You have to pass either cond or doc_id")
+        if cond is None and not self.event_hook["read"]:
+            # Nothing observes the read, a membership test is enough
+            return doc_id in await self._read_table()
         return (await self.get(cond, doc_id=doc_id)) is not None
 
     async def update(
@@ -508,38 +713,33 @@ class Table(Generic[IDVar, DocVar]):
         :returns: a list containing the updated document's ID
         """
 
-        # Define the function that will perform the update
-        if callable(fields):
-            def perform_update(table: MutableMapping[IDVar, DocVar], doc_id: IDVar):
-                # Update documents by calling the update function provided by
-                # the user
-                fields(table[doc_id])  # type: ignore
-        else:
-            def perform_update(table: MutableMapping[IDVar, DocVar], doc_id: IDVar):
-                nonlocal fields
-                if self._isolevel >= 2:
-                    fields = deepcopy(fields)
-                # Update documents by setting all fields from the provided data
-                table[doc_id].update(fields)  # type: ignore
-
         docs = await self.search(cond, doc_ids=doc_ids)
-        ids = [doc.doc_id for doc in docs]
-
-        updated_ids = []
+        updated_ids = [doc.doc_id for doc in docs]
+        call = callable(fields)
+        isolated = self._isolevel >= 2
 
         def updater(table: MutableMapping[IDVar, DocVar]):
+            emit = self.event_hook.emit if self.event_hook["update"] else None
+            # Lets a batch save the documents before they are modified
+            modify = getattr(table, "modify", table.__getitem__)
             # Process all documents
-            for doc_id in ids:
-                # Add ID to list of updated documents
-                updated_ids.append(doc_id)
-
-                # Perform the update (see above)
-                perform_update(table, doc_id)
+            for doc_id in updated_ids:
+                doc = modify(doc_id)
+                if call:
+                    # Update documents by calling the update function
+                    # provided by the user
+                    fields(doc)  # type: ignore
+                else:
+                    # Update documents by setting all fields from the
+                    # provided data, every document gets its own copy
+                    doc.update(fast_deepcopy(fields) if isolated  # type: ignore
+                               else fields)
 
-                self.event_hook.emit("update", self, table[doc_id])
+                if emit is not None:
+                    emit("update", self, doc)
 
         # Perform the update operation (see _update_table for details)
-        await self._update_table(updater)
+        await self._update_table(updater, updated_ids)
 
         return updated_ids
 
@@ -556,18 +756,20 @@ class Table(Generic[IDVar, DocVar]):
         """
 
         # Define the function that will perform the update
+        isolated = self._isolevel >= 2
+
         def perform_update(fields: Callable[[Mapping], None] | Mapping,
-                           table: MutableMapping[IDVar, DocVar], doc_id: IDVar):
+                           doc: DocVar):
             if callable(fields):
                 # Update documents by calling the update function provided
                 # by the user
-                fields(table[doc_id])
+                fields(doc)
             else:
-                if self._isolevel >= 2:
-                    fields = deepcopy(fields)
+                if isolated:
+                    fields = fast_deepcopy(fields)
                 # Update documents by setting all fields from the provided
                 # data
-                table[doc_id].update(fields)
+                doc.update(fields)
 
         # Perform the update operation for documents specified by a query
 
@@ -575,27 +777,29 @@ class Table(Generic[IDVar, DocVar]):
         updated_ids = []
 
         def updater(table: MutableMapping[IDVar, DocVar]):
-            # We need to convert the keys iterator to a list because
-            # we may remove entries from the ``table`` dict during
-            # iteration and doing this without the list conversion would
-            # result in an exception (RuntimeError: dictionary changed size
-            # during iteration)
-            for doc_id in list(table.keys()):
+            emit = self.event_hook.emit if self.event_hook["update"] else None
+            # Documents are only updated in place, the ``table`` dict itself
+            # never changes size, so it is safe to iterate it directly
+            modify = getattr(table, "modify", None)
+            for doc_id, doc in table.items():
                 for fields, cond in updates:
 
                     # Pass through all documents to find documents matching the
-                    # query. Call the processing callback with the document ID
-                    if cond(table[doc_id]):
+                    # query. Call the processing callback with the document
+                    if cond(doc):
                         # Add ID to list of updated documents
                         updated_ids.append(doc_id)
+                        if modify is not None:  # Lets a batch save it first
+                            modify(doc_id)
 
                         # Perform the update (see above)
-                        perform_update(fields, table, doc_id)
+                        perform_update(fields, doc)
 
-                        self.event_hook.emit("update", self, table[doc_id])
+                        if emit is not None:
+                            emit("update", self, doc)
 
         # Perform the update operation (see _update_table for details)
-        await self._update_table(updater)
+        await self._update_table(updater, updated_ids)
 
         return updated_ids
 
@@ -667,7 +871,7 @@ class Table(Generic[IDVar, DocVar]):
                     self.event_hook.emit("delete", self, doc)
 
         # Perform the remove operation
-        await self._update_table(rm_updater)
+        await self._update_table(rm_updater, ids)
 
         return ids
 
@@ -680,7 +884,7 @@ class Table(Generic[IDVar, DocVar]):
         await self._update_table(lambda table: table.clear())
 
         # Reset document ID cache
-        self.document_id_class.clear_cache(self)
+        self._clear_id_cache(self)
 
         # Trigger event
         self.event_hook.emit("truncate", self)
@@ -721,11 +925,18 @@ class Table(Generic[IDVar, DocVar]):
         """
 
         self._data_cache_clear_flag = True
+        self._written = None
 
     def __len__(self):
         """
         Count the total number of documents in this table.
         """
+        cache = self._cache
+        if cache is not None and not self._data_cache_clear_flag:
+            return len(cache)
+        if self.no_dbcache:
+            # Nothing would keep the cooked documents, just count the raw ones
+            return len(sync_await(self._read_raw_table()))
         table = sync_await(self._read_table())
         return len(table)
 
@@ -738,12 +949,18 @@ class Table(Generic[IDVar, DocVar]):
 
         # Iterate all documents and their IDs
         async def iterator():
-            for doc_id, doc in (await self._read_table()).items():
+            table = await self._read_table()
+            # Look these up once rather than per document
+            doc_cls = self.document_class
+            isolated = self._isolevel >= 2
+            emit = self.event_hook.emit if self.event_hook["read"] else None
+            for doc_id, doc in table.items():
                 # Convert documents to the document class
-                if self._isolevel >= 2:
-                    doc = deepcopy(doc)
-                self.event_hook.emit("read", self, doc)
-                yield self.document_class(doc, doc_id)
+                if isolated:
+                    doc = fast_deepcopy(doc)
+                if emit is not None:
+                    emit("read", self, doc)
+                yield doc_cls(doc, doc_id)
         return iterator()
 
     def _get_next_id(self, keys: Collection[IDVar]) -> IDVar:
@@ -751,7 +968,7 @@ class Table(Generic[IDVar, DocVar]):
         Return the ID for a newly inserted document.
         """
 
-        return self.document_id_class.next_id(self, keys)
+        return self._next_id(self, keys)
 
     def __del__(self):
         """
@@ -774,42 +991,62 @@ class Table(Generic[IDVar, DocVar]):
             self._query_cache_clear_flag = False
 
         # First, we check if the query has a cache
-        cached_ids = self._query_cache.get(cond) if cacheable else None
-        if cached_ids is not None:
-            try:
-                docs = {_id: docs[_id] for _id in cached_ids}
+        source = docs
+        cached = self._query_cache.get(cond) if cacheable else None
+        cached_docs = None
+        if cached is not None:
+            cached_src, cached_docs = cached
+            if cached_src is source:  # Computed from the same data
+                docs = cached_docs.copy()
                 cacheable = False  # No need to cache again
-            except KeyError:
-                # The cache is invalid, so we need to recompute it
-                cached_ids = None
+            else:
+                # The table was reloaded, so only the IDs can be trusted
+                try:
+                    docs = {_id: docs[_id] for _id in cached_docs}
+                    cacheable = False
+                except KeyError:
+                    # The cache is invalid, so we need to recompute it
+                    cached_docs = None
 
-        # doc_ids sieve, if doc_ids are specified
         if doc_ids is not None:
             cacheable = False  # cache only based on cond
-            docs = {_id: docs[_id] for _id in doc_ids if _id in docs}
-
-        # cond sieve, if cond is specified, otherwise apply limit here
-        if cond is not None and cached_ids is None:  # type: ignore[redundant-expr]
-            # Also apply limit here since cond() might be expensive
-            docs = {
-                _id: doc for _id, doc in docs.items()
-                if cond(doc) and (limit := limit - 1) >= 0
-            }
+
+        # Apply the doc_ids, cond and limit sieves in a single pass
+        check = cond if cond is not None and cached_docs is None else None
+        fresh = cached_docs is not None  # Whether `docs` is already a copy
+        if doc_ids is None and check is None:
+            if limit < len(docs):
+                docs = dict(islice(docs.items(), limit))
+                fresh = True
+        elif doc_ids is None and limit >= len(docs):
+            # Nothing can cut the result short, let a comprehension drive
+            # the loop without any per-document bookkeeping
+            docs = {_id: doc for _id, doc in docs.items() if check(doc)}
+            fresh = True
+        else:
+            items: Iterable[tuple[IDVar, DocVar]] = docs.items()
+            if doc_ids is not None:
+                items = ((_id, docs[_id]) for _id in doc_ids if _id in docs)
+            out: dict[IDVar, DocVar] = {}
+            for _id, doc in items:
+                if check is not None and not check(doc):
+                    continue
+                if len(out) >= limit and _id not in out:
+                    # More matches than the limit, the result is incomplete
+                    cacheable = False
+                    break
+                out[_id] = doc
+            docs, fresh = out, True
+
+        if cacheable:
+            # Update the query cache.
             # Note also that by default we expect custom query objects to be
             # cacheable (which means they need to have a stable hash value).
             # This is to keep consistency with TinyDB's behavior before
             # `is_cacheable` was introduced which assumed that all queries
             # are cacheable.
-            cacheable = cacheable and is_cacheable(cond)
-        # limit sieve
-        elif limit < len(docs):
-            docs = {_id: docs[_id] for _id in docs if (limit := limit - 1) >= 0}
-
-        cacheable = cacheable and limit >= 0  # If the limit is not reached
-
-        if cacheable:
-            # Update the query cache
-            self._query_cache[cond] = tuple(docs.keys())
+            self._query_cache[cond] = (source, cast(dict, docs))
+            fresh = False  # The cached dict must not leak to the caller
 
         # Trigger event
         if self.event_hook["read"]:
@@ -817,12 +1054,10 @@ class Table(Generic[IDVar, DocVar]):
                 self.event_hook.emit("read", self, doc)
 
         # deepcopy if isolation level is >= 2
-        # otherwise return shallow copy in case of no sieve been applied
-        # ps: sieves will perform a shallow copy.
-        if not isinstance(docs, dict):
-            docs = dict(docs)
-
-        return deepcopy(docs) if self._isolevel >= 2 else docs.copy()
+        # otherwise return a shallow copy, unless a sieve already made one
+        if self._isolevel >= 2:
+            return fast_deepcopy(docs if fresh else dict(docs))
+        return cast(dict, docs) if fresh else dict(docs)
 
     async def _read_table(self, block=True) -> MutableMapping[IDVar, DocVar]:
         """
@@ -830,6 +1065,14 @@ class Table(Generic[IDVar, DocVar]):
         if cache is not exist.
         """
 
+        # Without isolation, a valid cache is returned as is, without waiting
+        # for the lock. Updaters mutate the cache before it is written, so
+        # such a reader may see changes that are still to be committed.
+        cache = self._cache
+        if cache is not None and not self._data_cache_clear_flag \
+                and not self._isolevel:
+            return cache
+
         try:
             if block:
                 await self._lock.acquire()
@@ -837,32 +1080,37 @@ class Table(Generic[IDVar, DocVar]):
             if self._cache is not None and not self._data_cache_clear_flag:
                 return self._cache
 
-            self._data_cache_clear_flag = False
-
             # Read the table data from the underlying storage
-            raw = await self._read_raw_table()
-            cooked = None
-
-            cooked = self._cook(raw)
-            if not self.no_dbcache:
-                # Caching if no_dbcache is not set
-                self._cache = cooked
-            return cooked
+            return self._load(await self._read_raw_table())
 
         finally:
             if block:
                 self._lock.release()
 
+    def _load(self, raw: Mapping[Any, Mapping]
+              ) -> MutableMapping[IDVar, DocVar]:
+        """Cook the raw table data and cache it unless told not to."""
+        self._data_cache_clear_flag = False
+        cooked = self._cook(raw)
+        if not self.no_dbcache:
+            # Caching if no_dbcache is not set
+            self._cache = cooked
+        return cooked
+
     def _cook(self, raw: Mapping[Any, Mapping]
               ) -> MutableMapping[IDVar, DocVar]:
         doc_cls = self.document_class
         id_cls = self.document_id_class
-        return {
-            id_cls(doc_id): doc_cls(rdoc, doc_id=id_cls(doc_id))
-            for doc_id, rdoc in raw.items()
-        }
-
-    async def _read_raw_table(self) -> MutableMapping[Any, Mapping]:
+        if self.no_dbcache:
+            # Read again for every operation, most of which only need
+            # a few of the documents
+            return _LazyTable(raw, id_cls, doc_cls)
+        # Build each ID once, it is both the key and the document's ID,
+        # and let `map` drive the loops rather than bytecode
+        ids = list(map(id_cls, raw))
+        return dict(zip(ids, map(doc_cls, raw.values(), ids)))
+
+    async def _read_raw_table(self) -> Mapping[Any, Mapping]:
         """
         Read the table data from the underlying storage.
 
@@ -876,15 +1124,17 @@ class Table(Generic[IDVar, DocVar]):
 
         if tables is None:
             # The database is empty
-            return {}
+            return _EMPTY
 
         # Retrieve the current table's data
-        return tables.get(self.name, {})
+        return tables.get(self.name, _EMPTY)
 
     async def _update_table(self,
                             updater: Callable[
                                 [MutableMapping[IDVar, DocVar]],
-                                None | Coroutine[None, None, None]]):
+                                None | Coroutine[None, None, None]],
+                            changed: Collection[IDVar] | None = None,
+                            appended=False):
         """
         Perform a table update operation.
 
@@ -896,29 +1146,159 @@ class Table(Generic[IDVar, DocVar]):
 
         As a further optimization, we don't convert the documents into the
         document class, as the table data will *not* be returned to the user.
-        """
 
-        async with self._lock:
-            tables: MutableMapping[Any, Mapping] = await self._storage.read() or {}
+        Unless DB-level caching is disabled, the database is not read again
+        while the storage tells it still holds what this table last wrote,
+        see :meth:`Storage.is_current`.
 
-            table = await self._read_table(block=False)
+        Concurrent updates are applied together: whoever gets the lock first
+        runs every updater queued by then, in order, and writes once.
+        The changes of an updater that fails are undone, they are never
+        written along with those of the others.
 
-            # Perform the table update operation
-            ret = updater(table)
-            if inspect.isawaitable(ret):
-                await ret
-            tables[self.name] = table
+        Cached query results are patched with the documents in `changed`,
+        the IDs the updater touches, filled in by the time it returns.
+        `appended` tells they are new documents, added to the end of the
+        table. The query cache is cleared if `changed` is not given.
+        """
 
+        fut = asyncio.get_running_loop().create_future()
+        pending = self._pending_updates
+        entry = (updater, changed, appended, fut)
+        pending.append(entry)
+        try:
+            async with self._lock:
+                while not fut.done():
+                    batch = pending[:_MAX_BATCH]
+                    del pending[:_MAX_BATCH]
+                    await self._apply_updates(batch)
+        except asyncio.CancelledError:
+            try:  # Don't run it if it hasn't run yet
+                pending.remove(entry)
+            except ValueError:  # Already running, its outcome goes unheard
+                fut.add_done_callback(
+                    lambda f: f.cancelled() or f.exception())
+            raise
+        return fut.result()
+
+    async def _apply_updates(self, batch: list[_PendingUpdate]):
+        """
+        Apply a batch of updaters with a single storage write,
+        see :meth:`_update_table`.
+        """
+
+        started = 0  # The updaters that have started running
+        try:
+            storage = self._storage
+            written, self._written = self._written, None
+            reused = written is not None and storage.is_current(written)
+            if reused:
+                tables = cast(MutableMapping[Any, Mapping], written)
+            else:  # Others may have changed the other tables
+                tables = await storage.read() or {}
+
+            table = self._cache
+            if table is None or self._data_cache_clear_flag:
+                # Cook from the data at hand rather than reading it again
+                table = self._load(tables.get(self.name, _EMPTY))
+
+            # Perform the table update operations, a lone updater needs
+            # no undo log, the data cache is dropped if it fails
+            errors: list[BaseException | None] = []
+            single = len(batch) == 1
+            for updater, *_ in batch:
+                log = None if single else _UndoLog(table)
+                started += 1
+                try:
+                    ret = updater(table if log is None else log)
+                    if inspect.isawaitable(ret):
+                        await ret
+                except Exception as e:  # Only fails its own update
+                    errors.append(e)
+                    if log is None:
+                        self.clear_data_cache()
+                        self._query_cache.clear()
+                    else:
+                        log.undo()
+                else:
+                    errors.append(None)
+            if all(errors):  # Nothing changed, nothing to write
+                for (*_, fut), e in zip(batch, errors):
+                    fut.set_exception(cast(BaseException, e))
+                return
+            tables[self.name] = table.to_dict() if isinstance(
+                table, _LazyTable) else table
+
+            if reused:
+                # The other tables are the very objects written last time,
+                # marked right before the write so no other write takes it
+                for name in tables:
+                    if name != self.name:
+                        storage.mark_clean(name)
             try:
                 # Write the newly updated data back to the storage
-                await self._storage.write(tables)
+                await storage.write(tables)
             except BaseException:
                 # Writing failure, data cache is out of sync
                 self.clear_data_cache()
+                self._query_cache.clear()
                 raise
-            finally:
-                # Clear the query cache, as the table contents have changed
+            if not self.no_dbcache:
+                self._written = tables
+            # The table contents have changed
+            self._patch_query_cache(table, batch)
+        except Exception as e:
+            for *_, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        except BaseException:
+            # Cancelled, the updaters yet to run go back to the queue
+            self._pending_updates[:0] = batch[started:]
+            if started:
+                # The others can't tell if their changes have been written
+                self.clear_data_cache()
                 self._query_cache.clear()
+                for *_, fut in batch[:started]:
+                    fut.set_exception(RuntimeError(
+                        "Interrupted by the cancellation of another update"))
+            raise
+
+        for (*_, fut), e in zip(batch, errors):
+            if e is None:
+                fut.set_result(None)
+            else:
+                fut.set_exception(e)
+
+    def _patch_query_cache(self, table: MutableMapping[IDVar, DocVar],
+                           batch: list[_PendingUpdate]):
+        """
+        Bring the cached query results up to date with the documents changed
+        by a batch of updaters, rather than dropping them all.
+        """
+
+        cache = self._query_cache
+        if self._query_cache_clear_flag or not cache:
+            return
+        if any(changed is None for _, changed, _, _ in batch):
+            cache.clear()
+            return
+        try:
+            for cond, (_, docs) in list(cache.items()):
+                for _, changed, appended, _ in batch:
+                    for doc_id in changed:
+                        doc = table.get(doc_id)
+                        if doc is None or not cond(doc):
+                            docs.pop(doc_id, None)
+                        elif appended or doc_id in docs:
+                            docs[doc_id] = doc
+                        else:  # Its place in the result is unknown
+                            del cache[cond]
+                            break
+                    if cond not in cache:
+                        break
+        except Exception:  # A query failed, recompute them when needed
+            cache.clear()
 
 
 ###### Event Hints ######
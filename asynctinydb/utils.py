@@ -8,8 +8,7 @@ from contextlib import suppress
 from typing import Any, Iterator, TypeVar, Generic, Type, \
     TYPE_CHECKING, Callable
 
-from contextlib import suppress
-from cachetools import LRUCache as _LRUCache
+from copy import deepcopy
 from vermils.collections.fridge import FrozenDict, FrozenList, freeze
 from vermils.collections.strchain import StrChain
 from vermils.gadgets import mimics, sort_class, stringify_keys, supports_in
@@ -25,8 +24,9 @@ V_co = TypeVar("V_co", covariant=True)
 S = TypeVar("S", bound="StrChain")
 C = TypeVar("C", bound=Callable)
 
-__all__ = (("LRUCache", "freeze", "with_typehint", "stringify_keys",
+__all__ = (("LRUCache", "TinyLFUCache", "freeze", "with_typehint", "stringify_keys",
             "supports_in", "is_container", "is_iterable", "is_hashable",
+            "fast_deepcopy",
             "StrChain", "FrozenDict", "mimics", "sort_class", "FrozenList",
             ) + _async_tools_all
            )
@@ -69,7 +69,102 @@ def is_container(obj) -> bool:
     return hasattr(obj, "__contains__")
 
 
-class LRUCache(_LRUCache, Generic[K, V]):
+_ATOMIC_TYPES = frozenset({
+    type(None), bool, int, float, complex, str, bytes})
+_PLAIN_DICTS: dict[type, tuple[str, ...] | None] = {dict: ()}
+_COPY_PROTOCOL = ("__deepcopy__", "__reduce_ex__", "__reduce__",
+                  "__getstate__", "__setstate__")
+
+
+def _dict_slots(cls: type) -> tuple[str, ...] | None:
+    """
+    The slots of a ``dict`` subclass if ``deepcopy`` would copy its instances
+    just by copying their items, slots and ``__dict__``, `None` otherwise.
+    """
+    try:
+        return _PLAIN_DICTS[cls]
+    except KeyError:
+        pass
+    slots: tuple[str, ...] | None = ()
+    for c in cls.__mro__[:-1]:
+        if c is dict:
+            continue
+        names = vars(c)
+        if any(name in names for name in _COPY_PROTOCOL):
+            slots = None
+            break
+        declared = names.get("__slots__", ())
+        for name in (declared,) if isinstance(declared, str) else declared:
+            if name.startswith("__") and not name.endswith("__"):
+                slots = None  # Mangled, leave it to `deepcopy`
+                break
+            if name not in ("__dict__", "__weakref__"):
+                slots += (name,)  # type: ignore[operator]
+        if slots is None:
+            break
+    _PLAIN_DICTS[cls] = slots
+    return slots
+
+
+class _Cyclic(Exception):
+    """Raised by `_fast_deepcopy` on data that contains itself."""
+
+
+def _fast_deepcopy(obj: Any, path: set[int]) -> Any:
+    cls = type(obj)
+    if cls in _ATOMIC_TYPES:
+        return obj
+    # The containers being copied that lead to `obj`, like `deepcopy`'s memo
+    key = id(obj)
+    if key in path:
+        raise _Cyclic
+    path.add(key)
+    try:
+        if cls is dict:
+            return {k: _fast_deepcopy(v, path) for k, v in obj.items()}
+        if cls is list:
+            return [_fast_deepcopy(v, path) for v in obj]
+        if cls is tuple:
+            return tuple([_fast_deepcopy(v, path) for v in obj])
+        if isinstance(obj, dict):
+            slots = _dict_slots(cls)
+            if slots is not None:
+                # e.g. `Document`, rebuilt the way `deepcopy` would
+                new = cls.__new__(cls)
+                attrs = getattr(obj, "__dict__", None)
+                if attrs:
+                    new.__dict__.update(_fast_deepcopy(attrs, path))
+                for name in slots:
+                    try:
+                        value = getattr(obj, name)
+                    except AttributeError:  # Unset
+                        continue
+                    setattr(new, name, _fast_deepcopy(value, path))
+                dict.update(new, {k: _fast_deepcopy(v, path)
+                                  for k, v in obj.items()})
+                return new
+        return deepcopy(obj)
+    finally:
+        path.discard(key)
+
+
+def fast_deepcopy(obj: T) -> T:
+    """
+    A faster :func:`copy.deepcopy` for JSON-like data.
+
+    Dicts, lists and tuples are rebuilt directly and immutable scalars are
+    shared, anything else is handed over to :func:`copy.deepcopy`.
+    Unlike :func:`copy.deepcopy`, references shared within ``obj`` are
+    copied separately, cyclic data is handed over to :func:`copy.deepcopy`
+    as a whole once a cycle is found.
+    """
+    try:
+        return _fast_deepcopy(obj, set())
+    except _Cyclic:
+        return deepcopy(obj)
+
+
+class LRUCache(OrderedDict[K, V]):
     """
     A least-recently used (LRU) cache with a fixed cache size.
 
@@ -77,22 +172,143 @@ class LRUCache(_LRUCache, Generic[K, V]):
     entries in the cache exceeds the cache size, the least-recently accessed
     entry will be discarded.
 
-    This is implemented uses the ``cachetools`` package.
+    This is an ``OrderedDict``, so looking up an entry and moving it to the
+    most-recently used end are both done in C.
     """
 
     def __init__(self, capacity=None,
                  getsizeof: Callable[[Any], int] = None) -> None:
-        capacity = float("inf") if capacity is None else capacity
-        super().__init__(maxsize=capacity, getsizeof=getsizeof)
+        super().__init__()
+        self.maxsize = float("inf") if capacity is None else capacity
+        # Sizes are only tracked when they aren't all 1
+        self._sizes: dict[K, int] | None = None
+        self._currsize = 0
+        if getsizeof is not None:
+            self.getsizeof = getsizeof  # type: ignore[method-assign]
+            self._sizes = {}
+
+    @staticmethod
+    def getsizeof(value: Any) -> int:
+        return 1
+
+    @property
+    def currsize(self) -> int:
+        return len(self) if self._sizes is None else self._currsize
 
     @property
     def lru(self) -> list[K]:
-        return list(self.keys())
+        """Keys from the least to the most recently used."""
+        return list(self)
 
     @property
     def length(self) -> int:
         return len(self)
 
+    def get(self, key: K, default: D = None) -> V | D:  # type: ignore
+        # Reordering fails on a miss, no separate membership test needed
+        try:
+            self.move_to_end(key)
+        except KeyError:
+            return default
+        return dict.__getitem__(self, key)
+
+    def __getitem__(self, key: K) -> V:
+        self.move_to_end(key)
+        return super().__getitem__(key)
+
     def __setitem__(self, key: K, value: V) -> None:
-        with suppress(ValueError):
+        sizes = self._sizes
+        if sizes is not None:
+            size = self.getsizeof(value)
+            if size > self.maxsize:  # Would never fit
+                return
+            self._currsize += size - sizes.get(key, 0)
+            sizes[key] = size
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while (len(self) if sizes is None else self._currsize) > self.maxsize:
+            self.popitem()
+
+    def _forget(self, key: K) -> None:
+        if self._sizes is not None:
+            self._currsize -= self._sizes.pop(key, 0)
+
+    def __delitem__(self, key: K) -> None:
+        super().__delitem__(key)
+        self._forget(key)
+
+    def pop(self, key: K, *default: Any) -> Any:  # type: ignore[override]
+        value = super().pop(key, *default)
+        self._forget(key)
+        return value
+
+    def popitem(self, last: bool = False) -> tuple[K, V]:
+        """Remove and return the least-recently used entry by default."""
+        key, value = super().popitem(last)
+        self._forget(key)
+        return key, value
+
+    def clear(self) -> None:
+        super().clear()
+        if self._sizes is not None:
+            self._sizes.clear()
+            self._currsize = 0
+
+
+class TinyLFUCache(LRUCache[K, V]):
+    """
+    An LRU cache guarded by a TinyLFU admission policy.
+
+    Every ``get`` is counted in a small count-min sketch. Once the cache is
+    full, a new entry is only admitted if it has been requested more often
+    than the least-recently used entry it would replace, so one-off scans
+    can't flush out frequently used entries. The counters are halved
+    periodically to let old popularity fade.
+
+    Set it as ``Table.query_cache_class`` to use it for query caches.
+    """
+
+    def __init__(self, capacity=None,
+                 getsizeof: Callable[[Any], int] = None,
+                 width: int = 1024, depth: int = 4) -> None:
+        super().__init__(capacity, getsizeof)
+        self._width = width
+        self._sketch = [[0] * width for _ in range(depth)]
+        self._additions = 0
+        self._sample_size = 10 * width
+
+    def _cells(self, key: K) -> Iterator[tuple[list[int], int]]:
+        h = hash(key)
+        width = self._width
+        for i, row in enumerate(self._sketch):
+            yield row, hash((i, h)) % width
+
+    def frequency(self, key: K) -> int:
+        """Estimate how often the key has been requested."""
+        return min(row[i] for row, i in self._cells(key))
+
+    def _record(self, key: K) -> None:
+        for row, i in self._cells(key):
+            if row[i] < 15:  # 4-bit counters, as in the paper
+                row[i] += 1
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            # Age all counters so that the sketch follows recent requests
+            for row in self._sketch:
+                row[:] = [c >> 1 for c in row]
+            self._additions //= 2
+
+    def get(self, key: K, default: D = None) -> V | D:  # type: ignore
+        # Only requests are counted, ``__getitem__`` also serves evictions
+        self._record(key)
+        return super().get(key, default)
+
+    def __setitem__(self, key: K, value: V) -> None:
+        if key in self or not self or (
+                self.currsize + self.getsizeof(value) <= self.maxsize):
+            super().__setitem__(key, value)
+            return
+        # Full, the new entry has to beat the least-recently used one,
+        # which stays where it is otherwise
+        if self.frequency(key) > self.frequency(next(iter(self))):
             super().__setitem__(key, value)
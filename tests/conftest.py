@@ -14,16 +14,15 @@ conv = Modifier.Conversion
 
 key = "asdfghjklzxcvbnm"
 mods: list = list(product(
-    (lambda x: x, comp.blosc2, comp.brotli),
-    (partial(alg, key=key)  # type: ignore
-     for alg in (lambda x, key: x, enc.AES_GCM,)),
+    (lambda x: x, comp.blosc2, comp.brotli, comp.zstd),
+    (lambda x: x, partial(enc.AES_GCM, key=key)),
     (lambda x: x, conv.ExtendedJSON,),
 ))
 
 
 @pytest.fixture(params=[
     "memory", "json", "json-encrypted", "json-isolevel0",
-    "json-isolevel1", "json-isolevel2", "json-nocache"] + mods)
+    "json-isolevel1", "json-isolevel2", "json-nocache", "json-caching"] + mods)
 async def db(request):
     with tempfile.TemporaryDirectory() as tmpdir:
         match request.param:
@@ -44,6 +43,9 @@ async def db(request):
                 db_.isolevel = 2
             case "json-nocache":
                 db_ = TinyDB(os.path.join(tmpdir, "test.db"), no_dbcache=True)
+            case "json-caching":
+                db_ = TinyDB(os.path.join(tmpdir, "test.db"),
+                             storage=CachingMiddleware(JSONStorage))
             case _:
                 if isinstance(request.param, tuple):
                     db_ = TinyDB(os.path.join(tmpdir, "test.db"),
@@ -58,6 +60,16 @@ async def db(request):
             yield db_
 
 
+@pytest.fixture
+async def memory_db():
+    """For tests of table logic that doesn't depend on the storage"""
+    db_ = TinyDB(storage=MemoryStorage)
+    await db_.insert_multiple({"int": 1, "char": c} for c in "abc")
+
+    async with db_:
+        yield db_
+
+
 @pytest.fixture
 def storage():
     return CachingMiddleware(MemoryStorage)()
@@ -0,0 +1,167 @@
+import asyncio
+import pytest
+from vermils.react import ActionCentipede as _ActionCentipede
+from asynctinydb.event_hooks import ActionChain, ActionCentipede, EventHook
+from asynctinydb.event_hooks import EventHint
+
+
+def test_action_chain_init():
+    assert list(ActionChain()) == []
+    assert ActionChain(limit=1).limit == 1
+
+    def action(ev):
+        ...
+    chain = ActionChain([action])
+    assert list(ActionChain(chain)) == [action]
+    assert ActionChain(chain)._seq is not chain._seq
+
+
+def test_action_chain_actions():
+    def double(ev, x):
+        return x * 2
+
+    def square(ev, x):
+        return x ** 2
+
+    chain = ActionChain([double])
+    assert chain.trigger("ev", 3) == (6,)
+    assert chain.actions is chain.actions == (double,)
+    chain.append(square)
+    assert chain.actions == (double, square)
+    assert chain.trigger("ev", 3) == (6, 9)
+    chain.remove(double)
+    assert chain.actions == (square,)
+    chain += ActionChain([double])
+    assert chain.actions == (square, double)
+    chain.insert(0, double)
+    chain.extend([square])
+    assert chain.actions == (double, square, double, square)
+    chain.clear()
+    assert chain.actions == () and chain.trigger("ev", 3) == ()
+
+
+def test_action_chain_contains():
+    class Unhashable:
+        __hash__ = None  # type: ignore
+
+        def __call__(self, ev):
+            ...
+
+    def action(ev):
+        ...
+
+    chain = ActionChain([action, action])
+    assert action in chain and print not in chain
+    assert Unhashable() not in chain
+    chain.remove(action)
+    assert action in chain
+    chain.remove(action)
+    assert action not in chain
+    with pytest.raises(ValueError):
+        chain.remove(action)
+
+    unhashable = Unhashable()
+    chain.append(unhashable)
+    assert unhashable in chain and action not in chain
+    chain.append(action)
+    assert action in chain
+
+
+async def test_action_chain_atrigger():
+    chain = ActionChain()
+    assert await chain.atrigger("ev") == ()
+    assert await chain.ordered_atrigger("ev") == ()
+
+    async def double(ev, x):
+        return x * 2
+
+    async def square(ev, x):
+        await asyncio.sleep(0.01)
+        return x ** 2
+
+    chain.append(double)
+    assert await chain.atrigger("ev", 3) == (6,)
+    assert await chain.ordered_atrigger("ev", 3) == (6,)
+
+    chain.append(square)
+    assert await chain.atrigger("ev", 3) == (6, 9)
+    assert await chain.ordered_atrigger("ev", 3) == (6, 9)
+
+
+async def test_event_hook_aemit_stream():
+    hook = EventHook()
+    chain = ActionChain()
+    hook.hook("ev", chain)
+
+    async def slow(ev, x):
+        await asyncio.sleep(0.05)
+        return "slow"
+
+    async def fast(ev, x):
+        return "fast"
+
+    chain.append(slow)
+    chain.append(fast)
+    assert [r async for r in hook.aemit_stream("ev", 1)] == ["fast", "slow"]
+
+    with pytest.raises(ValueError):
+        hook.aemit_stream("missing")
+
+
+async def test_event_hook_emit_empty():
+    hook = EventHook()
+    hook.hook("chain", ActionChain())
+    hook.hook("centipede", ActionCentipede())
+    hook.hook("vermils_centipede", _ActionCentipede())
+    assert hook.emit("chain") == ()
+    assert await hook.aemit("chain") == ()
+    assert hook.emit("centipede") is None
+    assert await hook.aemit("centipede") is None
+    assert await hook.aemit("vermils_centipede") is None
+    with pytest.raises(ValueError):
+        hook.emit("missing")
+    with pytest.raises(ValueError):
+        await hook.aemit("missing")
+
+    hook["chain"].append(lambda ev, x: x + 1)
+    assert hook.emit("chain", 1) == (2,)
+
+
+async def test_action_centipede_without_sentinel():
+    def add(ev, x, y=0):
+        return x + y + 1
+
+    def double(ev, x):
+        return x * 2
+
+    centipede = ActionCentipede([add, double])
+    assert centipede.trigger("ev", 1, y=1) == 6
+    centipede.reverse = True
+    assert centipede.trigger("ev", 1) == 3
+    assert ActionCentipede().trigger("ev", 1) is None
+
+    async def aadd(ev, x, y=0):
+        return x + y + 1
+
+    async def adouble(ev, x):
+        return x * 2
+
+    centipede = ActionCentipede([aadd, adouble])
+    assert await centipede.atrigger("ev", 1, y=1) == 6
+    centipede.reverse = True
+    assert await centipede.atrigger("ev", 1) == 3
+    assert await ActionCentipede().atrigger("ev", 1) is None
+
+
+def test_event_hint_cache():
+    hook = EventHook()
+    hook.hook("write.post", ActionChain())
+    hint = EventHint(hook)
+    assert hint.write is hint.write
+    assert hint.write.post is hint.write.post
+
+    @hint.write.post
+    def action(ev):
+        ...
+
+    assert list(hook["write.post"]) == [action]
@@ -1,3 +1,4 @@
+import asyncio
 import os
 
 import pytest
@@ -66,6 +67,31 @@ async def test_caching_flush_manually(storage):
     assert storage.memory
 
 
+async def test_caching_flush_interval():
+    class CountingStorage(MemoryStorage):
+        writes = 0
+
+        async def write(self, data):
+            CountingStorage.writes += 1
+            await super().write(data)
+
+    storage = CachingMiddleware(CountingStorage, flush_interval=0.01)()
+    for x in range(10):
+        await storage.write({"x": x})
+    assert storage.storage.memory is None  # Not flushed yet
+
+    await asyncio.sleep(0.05)
+    assert storage.storage.memory == {"x": 9}
+    assert CountingStorage.writes == 1  # All merged into one flush
+
+    await storage.write({"x": 10})
+    await storage.close()  # Flushes without waiting for the timer
+    assert storage.storage.memory == {"x": 10}
+    assert CountingStorage.writes == 2
+    await asyncio.sleep(0.05)
+    assert CountingStorage.writes == 2
+
+
 async def test_caching_write(storage):
     # Write contents
     await storage.write(doc)
@@ -486,6 +486,13 @@ def test_hash():
     assert (Query().key1.exists() | Query().key2.exists()) in d
     assert (Query().key2.exists() | Query().key1.exists()) in d
 
+    # The memoized hash follows the frame
+    query = Query()
+    empty = hash(query)
+    assert hash(query) == empty
+    query._frame = ("path", ("key1",))
+    assert hash(query) == hash(Query().key1) != empty
+
 
 def test_orm_usage():
     data = {"name": "John", "age": {"year": 2000}}
@@ -1,6 +1,9 @@
 import ujson as json
+import asyncio
 import os
 import random
+import subprocess
+import sys
 import tempfile
 import re
 import uuid
@@ -10,7 +13,8 @@ import pytest
 
 from asynctinydb import TinyDB, where, Modifier
 from asynctinydb.storages import JSONStorage, MemoryStorage, EncryptedJSONStorage, Storage, touch
-from asynctinydb.table import Document
+from asynctinydb.storages import _loads
+from asynctinydb.table import BaseID, Document
 
 random.seed()
 
@@ -39,6 +43,13 @@ async def test_json(tmpdir):
     await storage.close()
 
 
+def test_json_lazy_import():
+    code = "import sys, asynctinydb; print('ujson' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True,
+                         text=True, check=True).stdout
+    assert out.strip() == "False"
+
+
 async def test_json_kwargs(tmpdir):
     db_file = tmpdir.join('test.db')
     db = TinyDB(str(db_file), sort_keys=True, indent=4)
@@ -60,6 +71,286 @@ async def test_json_kwargs(tmpdir):
     await db.close()
 
 
+async def test_json_default(tmpdir):
+    storage = JSONStorage(tmpdir / "test.db", default=sorted)
+    await storage.write({"set": {3, 1, 2}})
+    assert await storage.read() == {"set": [1, 2, 3]}
+    await storage.close()
+
+
+async def test_json_fallback(tmpdir):
+    """Data unsupported by orjson should be handled by ujson"""
+    storage = JSONStorage(tmpdir / "test.db")
+    await storage.write({"big": 2 ** 70})
+    assert (tmpdir / "test.db").read() == '{"big":1180591620717411303424}'
+
+    with open(tmpdir / "test.db", "w") as f:
+        f.write('{"nan": NaN}')
+    assert (await storage.read())["nan"] != (await storage.read())["nan"]
+
+    # Read and written back without losing precision
+    big = {"t": {"1": {"a": 2 ** 70, "b": -2 ** 63 - 1, "c": 2 ** 64 - 1}}}
+    await storage.write(big)
+    assert await storage.read() == big
+    assert type((await storage.read())["t"]["1"]["a"]) is int
+    inf = float("inf")
+    await storage.write({"t": {"1": {"a": [inf, -inf], "b": None}}})
+    assert await storage.read() == {"t": {"1": {"a": [inf, -inf], "b": None}}}
+    await storage.write({"nan": float("nan")})
+    assert (await storage.read())["nan"] != (await storage.read())["nan"]
+
+    storage = JSONStorage(tmpdir / "test.db", access_mode="rb+")
+    await storage.write(doc)
+    assert doc == await storage.read()
+    await storage.close()
+
+
+async def test_json_exact_reads(tmpdir, monkeypatch):
+    """Files written with orjson are read back without scanning them"""
+    import asynctinydb.storages as storages
+    scanned = []
+    has_long_ints = storages._has_long_ints
+    monkeypatch.setattr(storages, "_has_long_ints",
+                        lambda raw: scanned.append(raw) or has_long_ints(raw))
+
+    path = tmpdir / "test.db"
+    storage = JSONStorage(path)
+    await storage.write(doc)
+    assert await storage.read() == doc
+    assert not scanned
+
+    # Written with ujson, or by someone else
+    await storage.write({"big": 2 ** 70})
+    assert await storage.read() == {"big": 2 ** 70}
+    assert len(scanned) == 1
+    await storage.write(doc)
+    path.write_text('{"big": 1180591620717411303424}', "utf-8")
+    assert await storage.read() == {"big": 2 ** 70}
+    assert len(scanned) == 2
+    await storage.close()
+
+
+async def test_json_text_mode(tmpdir):
+    path = tmpdir / "test.db"
+    data = {"ä": "😀", "int": 1}
+    storage = JSONStorage(path)
+    await storage.write(data)
+    assert json.loads(path.read_text("utf-8")) == data
+    assert await storage.read() == data
+    await storage.close()
+
+    storage = JSONStorage(path, encoding="utf-16")
+    await storage.write(data)
+    assert json.loads(path.read_text("utf-16")) == data
+    assert await storage.read() == data
+    await storage.close()
+
+    # Escaped for encodings that can't hold every character
+    for encoding in ("ascii", "latin-1"):
+        path = tmpdir / f"{encoding}.db"
+        db = TinyDB(path, encoding=encoding)
+        await db.insert({"a": "日本語"})
+        assert "\\u65e5\\u672c\\u8a9e" in path.read_text(encoding)
+        assert (await db.all())[0]["a"] == "日本語"
+        await db.close()
+
+
+async def test_json_large(tmpdir):
+    storage = JSONStorage(tmpdir / "test.db")
+    data = {str(i): doc for i in range(1000)}  # Parsed in the worker thread
+    await storage.write(data)
+    assert await storage.read() == data
+    await storage.close()
+
+
+async def test_json_journal(tmpdir):
+    path = tmpdir / "test.db"
+    wal = tmpdir / "test.db.wal"
+    storage = JSONStorage(path, journal=True)
+    data = {"_default": {str(i): doc for i in range(20)}, "meta": 1}
+    await storage.write(data)  # The first write rewrites the file
+    assert not wal.exists()
+    main = path.read()
+
+    data["_default"]["20"] = {"a": 1}
+    del data["_default"]["0"]
+    data["meta"] = 2
+    data["new"] = {"1": {"b": 2}}
+    await storage.write(data)
+    await storage.write(data)  # Nothing changed, nothing appended
+    assert path.read() == main
+    assert len(wal.readlines()) == 2  # Header and one record
+    assert await storage.read() == data
+    assert await JSONStorage(path, journal=True).read() == data
+
+    del data["new"]
+    data["_default"]["1"] = {"c": 3}
+    await storage.write(data)
+    assert await storage.read() == data
+
+    # Compacted once the journal outgrows the file
+    for i in range(20):
+        data["_default"][str(i)] = {"i": "x" * 200}
+        await storage.write(data)
+    assert await storage.read() == data
+    assert len(wal.readlines()) < 20
+    await storage.close()
+
+    # A stale journal is ignored
+    storage = JSONStorage(path, journal=True)
+    await storage.write(data)
+    await storage.write({**data, "meta": 3})
+    stale = wal.read_binary()
+    await JSONStorage(path).write(data)
+    with open(wal, "wb") as f:
+        f.write(stale)
+    assert await storage.read() == data
+
+    await storage.write({**data, "meta": 4})
+    await storage.close()
+
+    # So is a torn record
+    with open(wal, "ab") as f:
+        f.write(b'{"put": {"meta"')
+    storage = JSONStorage(path, journal=True)
+    assert (await storage.read())["meta"] == 4
+    await storage.write(data)
+    assert not wal.exists()
+    await storage.close()
+
+    async with TinyDB(tmpdir / "db.json", journal=True) as db:
+        await db.insert_multiple({"x": i} for i in range(10))
+        await db.update({"x": -1}, doc_ids=[1])
+        await db.remove(doc_ids=[2])
+    async with TinyDB(tmpdir / "db.json", journal=True) as db:
+        assert await db.get(doc_id=1) == {"x": -1}
+        assert await db.get(doc_id=2) is None
+        assert await db.count(where("x") >= 0) == 8
+
+
+async def test_json_journal_hooks(tmpdir):
+    pytest.importorskip("cryptography")
+    pytest.importorskip("brotli")
+    path = tmpdir / "test.db"
+    wal = tmpdir / "test.db.wal"
+    key = "asdfghjklzxcvbnm"
+
+    def open_db():
+        return TinyDB(path, key=key, journal=True, storage=EncryptedJSONStorage,
+                      compression=Modifier.Compression.brotli)
+
+    async with open_db() as db:
+        await db.insert_multiple({"x": i, "pad": os.urandom(8).hex()}
+                                 for i in range(10))
+        main = path.read_binary()
+        await db.update({"x": -1}, doc_ids=[1])
+        await db.remove(doc_ids=[2])
+    assert path.read_binary() == main  # Only the journal was appended to
+    assert len(wal.readlines()) == 3
+    assert b"-1" not in wal.read_binary()  # Encrypted as well
+
+    async with open_db() as db:
+        assert (await db.get(doc_id=1))["x"] == -1
+        assert await db.get(doc_id=2) is None
+        assert len(db) == 9
+
+    # A torn record is ignored
+    with open(wal, "ab") as f:
+        f.write(wal.read_binary().splitlines()[-1][:20])
+    async with open_db() as db:
+        assert len(db) == 9
+        await db.insert({"x": 10})
+    async with open_db() as db:
+        assert await db.count(where("x") >= 0) == 9
+
+
+async def test_json_concurrent_writes(tmpdir):
+    path = tmpdir / "test.db"
+    written = []
+    storage = JSONStorage(path)
+    atomic_write = storage._atomic_write
+    storage._atomic_write = lambda data: written.append(atomic_write(data))
+    await asyncio.gather(*(storage.write({"i": i}) for i in range(20)))
+    assert await storage.read() == {"i": 19}
+    assert len(written) < 20  # Superseded writes are skipped
+
+    storage = JSONStorage(path, journal=True)
+    await asyncio.gather(*(storage.write({"t": {str(i): {}}}) for i in range(20)))
+    assert await storage.read() == {"t": {"19": {}}}
+    assert await JSONStorage(path, journal=True).read() == {"t": {"19": {}}}
+    await storage.close()
+
+
+async def test_json_table_fragments(tmpdir):
+    storage = JSONStorage(tmpdir / "test.db")
+    table1, table2 = {"1": {"a": 1}}, {2: {"b": [1, 2]}}
+    await storage.write({"t1": table1, "t2": table2})
+    assert not storage._fragments  # Kept only when some are marked
+    storage.mark_clean("t2")  # Nothing to reuse yet
+    await storage.write({"t1": table1, "t2": table2})
+    dumped = storage._fragments["t2"][1]
+
+    # Tables are serialized again unless marked clean for this write
+    table1["1"]["a"] = 2
+    storage.mark_clean("t2")
+    await storage.write({"t1": table1, "t2": table2})
+    assert storage._fragments["t2"][1] is dumped
+    assert await storage.read() == {"t1": {"1": {"a": 2}},
+                                    "t2": {"2": {"b": [1, 2]}}}
+
+    # Changes made in place are never missed without the mark
+    table2[2]["b"].append(3)
+    await storage.write({"t1": table1, "t2": table2, "t3": {}})
+    assert await storage.read() == {"t1": {"1": {"a": 2}},
+                                    "t2": {"2": {"b": [1, 2, 3]}}, "t3": {}}
+
+    # The mark only holds for the next write, and the same object
+    storage.mark_clean("t1")
+    await storage.write({"t1": {"1": {"a": 3}}, "t2": table2})
+    table2[2]["b"].clear()
+    await storage.write({"t1": table1, "t2": table2})
+    assert await storage.read() == {"t1": {"1": {"a": 2}}, "t2": {"2": {"b": []}}}
+    await storage.close()
+
+    # Tables mark the others clean when they reuse what they wrote
+    db = TinyDB(tmpdir / "test.db")
+    await db.table("t1").insert({"a": 3})
+    await db.table("t1").insert({"a": 4})
+    dumped = db.storage._fragments["t2"][1]
+    await db.table("t1").insert({"a": 5})
+    assert db.storage._fragments["t2"][1] is dumped
+    await db.table("t2").insert({"b": 1})  # Not reused, read again
+    assert len(await db.table("t1").all()) == 4
+    await db.close()
+    db = TinyDB(tmpdir / "test.db")
+    assert len(await db.table("t2").all()) == 2
+    await db.close()
+
+
+async def test_json_non_str_keys(tmpdir):
+    storage = JSONStorage(tmpdir / "test.db")
+    await storage.write({1: {2: "a"}, "list": [{3: None}], "tuple": ({4: 1},)})
+    assert await storage.read() == {"1": {"2": "a"}, "list": [{"3": None}],
+                                    "tuple": [{"4": 1}]}
+
+    from types import MappingProxyType
+    await storage.write({"proxy": MappingProxyType({"a": 1})})
+    assert await storage.read() == {"proxy": {"a": 1}}
+
+    # Deeper than the recursion limit
+    deep = nested = {0: None}
+    for _ in range(5000):
+        nested[0] = nested = {0: None}
+    with pytest.raises(OverflowError):  # Too deep for the serializer itself
+        await storage.write(deep)
+
+    a = {1: None}
+    a[1] = [a]
+    with pytest.raises(OverflowError):
+        await storage.write(a)
+    await storage.close()
+
+
 async def test_json_readwrite(tmpdir):
     """
     Regression test for issue #1
@@ -129,6 +420,17 @@ async def test_create_dirs():
     await JSONStorage(db_file, create_dirs=True).close()
     assert os.path.exists(db_file)
 
+    # Recreated when removed behind the storage's back
+    storage = JSONStorage(db_file, create_dirs=True)
+    os.remove(db_file)
+    os.rmdir(db_dir)
+    assert await storage.read() is None
+    os.remove(db_file)
+    os.rmdir(db_dir)
+    await storage.write(doc)
+    assert await storage.read() == doc
+    await storage.close()
+
     os.remove(db_file)
     os.rmdir(db_dir)
 
@@ -152,6 +454,14 @@ async def test_in_memory():
     await other.write({})
     assert (await other.read()) != await storage.read()
 
+    storage = MemoryStorage(copy_on_read=True)
+    await storage.write({"a": {"b": 1}})
+    data = await storage.read()
+    data["a"]["b"] = 2
+    assert await storage.read() == {"a": {"b": 1}}
+    await storage.write(data)
+    assert await storage.read() == {"a": {"b": 2}}
+
 
 async def test_in_memory_close():
     async with TinyDB(storage=MemoryStorage) as db:
@@ -241,12 +551,17 @@ async def test_yaml(tmpdir):
     except ImportError:
         return pytest.skip('PyYAML not installed')
 
-    def represent_doc(dumper, data):
-        # Represent `Document` objects as their dict's string representation
-        # which PyYAML understands
-        return dumper.represent_data(dict(data))
+    # libyaml bindings if available, PyYAML's pure Python ones otherwise
+    Dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+    Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+    class DocDumper(Dumper):
+        """Dumps tables as they are, no need to convert them first"""
 
-    yaml.add_representer(Document, represent_doc)
+    # Documents are plain mappings, IDs are stored as strings
+    DocDumper.add_representer(Document, DocDumper.represent_dict)
+    DocDumper.add_multi_representer(
+        BaseID, lambda dumper, i: dumper.represent_str(str(i)))
 
     class YAMLStorage(Storage):
         def __init__(self, filename):
@@ -258,16 +573,12 @@ async def test_yaml(tmpdir):
             return False
 
         async def read(self):
-            with open(self.filename) as handle:
-                data = yaml.safe_load(handle.read())
-                return data
+            with open(self.filename, 'rb') as handle:
+                return yaml.load(handle, Loader=Loader)
 
         async def write(self, data):
-            data = {k: ({str(_id): v for _id, v in tab.items()}
-                    if hasattr(tab, "items") else tab)
-                    for k, tab in data.items()}
-            with open(self.filename, 'w') as handle:
-                yaml.dump(data, handle)
+            with open(self.filename, 'wb') as handle:
+                yaml.dump(data, handle, Dumper=DocDumper, encoding="utf-8")
 
         async def close(self):
             pass
@@ -286,6 +597,34 @@ async def test_yaml(tmpdir):
     assert len(db) == 1
 
 
+async def test_json_durable(tmpdir, monkeypatch):
+    import asynctinydb.storages as storages
+    synced = []
+    fsync = storages._fsync
+    monkeypatch.setattr(storages, "_fsync",
+                        lambda fd: synced.append(fd) or fsync(fd))
+
+    # Every file is flushed before it replaces the old one,
+    # the directory once, on close
+    storage = JSONStorage(tmpdir / "test.db")
+    for i in range(3):
+        await storage.write({"_default": {"1": {"n": i}}})
+    assert len(synced) == 3
+    await storage.close()
+    assert len(synced) == 4
+    assert await JSONStorage(tmpdir / "test.db").read() \
+        == {"_default": {"1": {"n": 2}}}
+
+    # The directory too, on every write
+    synced.clear()
+    storage = JSONStorage(tmpdir / "test.db", durable=True)
+    for i in range(3):
+        await storage.write({"_default": {"1": {"n": i}}})
+    assert len(synced) == 6
+    await storage.close()
+    assert len(synced) == 6
+
+
 async def test_encoding(tmpdir):
     japanese_doc = {"Test": u"こんにちは世界"}
 
@@ -423,6 +762,68 @@ async def test_encrypted_json(tmpdir):
     assert doc == await storage.read()
 
 
+async def test_encrypted_json_layout(tmpdir, monkeypatch):
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    key = b"asdfghjklzxcvbnm"
+    doc = {"foo": "bar" * 2000}
+    for legacy in (False, True):
+        if legacy:  # `cryptography` before 45.0
+            monkeypatch.delattr(AESGCM, "encrypt_into", raising=False)
+        storage = EncryptedJSONStorage(tmpdir / "test.db", key=key)
+        await storage.write(doc)
+        raw = (tmpdir / "test.db").read_binary()
+        # Tag length, tag, nonce and ciphertext, with the tag in front
+        assert raw[0] == 16
+        tag, nonce, ct = raw[1:17], raw[17:33], raw[33:]
+        assert _loads(AESGCM(key).decrypt(nonce, ct + tag, None)) == doc
+        assert await storage.read() == doc
+        await storage.close()
+
+
+async def test_chacha20_poly1305(tmpdir, monkeypatch):
+    from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
+    key = b"asdfghjklzxcvbnm" * 2
+    doc = {"foo": "bar" * 2000}
+    for legacy in (False, True):
+        if legacy:  # `cryptography` before 45.0
+            monkeypatch.delattr(ChaCha20Poly1305, "encrypt_into",
+                                raising=False)
+        storage = JSONStorage(tmpdir / "test.db", access_mode="rb+")
+        Modifier.Encryption.ChaCha20_Poly1305(storage, key)
+        await storage.write(doc)
+        raw = (tmpdir / "test.db").read_binary()
+        # Nonce, then ciphertext with the tag appended
+        assert _loads(ChaCha20Poly1305(key).decrypt(
+            raw[:12], raw[12:], None)) == doc
+        assert await storage.read() == doc
+        await storage.close()
+
+    # A string key, with compression
+    storage = JSONStorage(tmpdir / "test.db", access_mode="rb+")
+    Modifier.Encryption.ChaCha20_Poly1305(storage, key.decode())
+    Modifier.Compression.zstd(storage)
+    await storage.write(doc)
+    assert await storage.read() == doc
+    await storage.close()
+
+
+async def test_encrypted_json_truncated_tag(tmpdir):
+    """Files written with a truncated MAC tag should remain readable"""
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    key = b"asdfghjklzxcvbnm"
+    nonce = os.urandom(16)
+    encryptor = Cipher(algorithms.AES(key), modes.GCM(nonce)).encryptor()
+    ct = encryptor.update(json.dumps({"foo": "bar"}).encode()) \
+        + encryptor.finalize()
+    with open(tmpdir / "test.db", "wb") as f:
+        f.write(b"\x08" + encryptor.tag[:8] + nonce + ct)
+
+    storage = EncryptedJSONStorage(tmpdir / "test.db", key=key)
+    assert await storage.read() == {"foo": "bar"}
+    with pytest.warns(DeprecationWarning):
+        Modifier.Encryption.AES_GCM(storage, key, mac_len=8)
+
+
 async def test_compress_brotli(tmpdir):
     storage = JSONStorage(tmpdir / "test.db", access_mode="rb+")
     Modifier.Compression.brotli(storage)
@@ -471,6 +872,52 @@ async def test_compress_blosc2(tmpdir):
     assert doc == await storage.read()
 
 
+async def test_compress_zstd(tmpdir):
+    storage = JSONStorage(tmpdir / "test.db", access_mode="rb+")
+    Modifier.Compression.zstd(storage)
+    doc = {str(i): i for i in range(10000)}
+    await storage.write(doc)
+    assert doc == await storage.read()
+    await storage.close()
+
+    storage = JSONStorage(tmpdir / "test.db", access_mode="rb+")
+
+    @storage.on.write.post
+    async def to_str(ev, s, d):
+        """Test encryption with a string"""
+        return d.decode("utf-8")
+
+    @storage.on.read.pre
+    async def to_bytes(ev, s, d):
+        return d.encode("utf-8")
+
+    Modifier.Compression.zstd(storage)
+    await storage.write(doc)
+    assert doc == await storage.read()
+
+    # Large data goes through the multithreaded compressor
+    storage.event_hook.clear_actions()
+    Modifier.Compression.zstd(storage, threads=2)
+    doc = {str(i): "x" * 32 for i in range(50000)}
+    await storage.write(doc)
+    assert doc == await storage.read()
+
+    # With a trained dictionary
+    samples = [{"name": f"user{i}", "age": i % 90, "tags": ["a", "b"][:i % 3]}
+               for i in range(1000)]
+    zdict = Modifier.Compression.zstd_dictionary(samples, size=1024)
+    assert 0 < len(zdict) <= 1024
+    doc = {"1": samples[7]}
+    sizes = []
+    for dict_data in (None, zdict):
+        storage.event_hook.clear_actions()
+        Modifier.Compression.zstd(storage, dict_data=dict_data)
+        await storage.write(doc)
+        sizes.append((tmpdir / "test.db").size())
+        assert doc == await storage.read()
+    assert sizes[1] < sizes[0]
+
+
 async def test_extended_json(tmpdir):
     storage = JSONStorage(tmpdir / "test.db")
 
@@ -512,6 +959,11 @@ async def test_extended_json(tmpdir):
         d["doc"] = d
         await storage.write(d)
 
+    # Shared references are not circular
+    shared = {"a": [1, 2]}
+    await storage.write({"x": shared, "y": [shared, shared]})
+    assert await storage.read() == {"x": shared, "y": [shared, shared]}
+
     storage.event_hook.clear_actions()
 
     # Test type_hooks and marker_hooks
@@ -545,3 +997,13 @@ async def test_extended_json(tmpdir):
     assert type(r["baz"]) is set
     assert r["baz"] == {1, 2, 3}
     assert r["complex"] == {"$complex": [1., 2.]}
+
+    # Native types can be hooked as well
+    storage.event_hook.clear_actions()
+    Modifier.Conversion.ExtendedJSON(
+        storage,
+        type_hooks={int: lambda x, c: {"$int": str(x)}},
+        marker_hooks={"$int": lambda x, r: int(x["$int"])})
+    await storage.write({"int": 42, "str": "42"})
+    assert json.loads(open(tmpdir / "test.db").read())["int"] == {"$int": "42"}
+    assert await storage.read() == {"int": 42, "str": "42"}
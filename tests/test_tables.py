@@ -1,3 +1,4 @@
+import asyncio
 import re
 
 import pytest
@@ -5,8 +6,9 @@ import datetime as dt
 from asynctinydb import where, Modifier
 from vermils.react import EventHook
 from asynctinydb.database import TinyDB
-from asynctinydb.storages import MemoryStorage
-from asynctinydb.table import UUID, Document
+from asynctinydb.storages import JSONStorage, MemoryStorage
+from asynctinydb.middlewares import CachingMiddleware
+from asynctinydb.table import UUID, Document, IncreID, _UndoLog
 
 
 async def test_next_id(db: TinyDB):
@@ -53,9 +55,9 @@ async def test_multiple_tables(db: TinyDB):
     assert len(table3) == 0
 
 
-async def test_caching(db: TinyDB):
-    table1 = db.table('table1')
-    table2 = db.table('table1')
+async def test_caching(memory_db: TinyDB):
+    table1 = memory_db.table('table1')
+    table2 = memory_db.table('table1')
 
     assert table1 is table2
 
@@ -78,8 +80,52 @@ async def test_query_cache(db: TinyDB):
     assert query2 in db._query_cache
 
 
-async def test_query_cache_with_mutable_callable(db: TinyDB):
-    table = db.table('table')
+async def test_query_cache_results(db: TinyDB):
+    query = where('int') == 1
+    assert len(await db.search(query)) == 3
+
+    # Popping from a cached result must not affect the cache
+    assert await db.get(query) is not None
+    assert len(await db.search(query)) == 3
+
+    # After a reload, cached IDs are resolved against the new data
+    db.clear_data_cache()
+    assert [doc['char'] for doc in await db.search(query)] == ['a', 'b', 'c']
+
+
+async def test_query_cache_patched(db: TinyDB):
+    table = db.table("patched")
+    await table.insert_multiple({"int": i % 3} for i in range(6))
+    query = where("int") == 1
+
+    async def check():
+        assert query in table._query_cache
+        cached = await table.search(query)
+        table.clear_cache()
+        assert cached == await table.search(query)
+
+    assert len(await table.search(query)) == 2
+    await table.insert({"int": 1})
+    await table.insert_multiple([{"int": 0}, {"int": 1}])
+    await check()
+    await table.update({"int": 2}, doc_ids=[2])  # No longer matches
+    await table.update({"x": 1}, query)
+    await check()
+    await table.remove(doc_ids=[5, 7])
+    await check()
+    assert [doc.doc_id for doc in await table.search(query)] == [9]
+
+    # A document that starts matching can't be placed in the cached result
+    await table.update({"int": 1}, doc_ids=[1])
+    assert query not in table._query_cache
+    assert [doc.doc_id for doc in await table.search(query)] == [1, 9]
+
+    await table.truncate()
+    assert len(table._query_cache) == 0
+
+
+async def test_query_cache_with_mutable_callable(memory_db: TinyDB):
+    table = memory_db.table('table')
     await table.insert({'val': 5})
 
     mutable = 5
@@ -99,8 +145,8 @@ async def test_query_cache_with_mutable_callable(db: TinyDB):
     assert len(table._query_cache) == 0
 
 
-async def test_zero_cache_size(db: TinyDB):
-    table = db.table('table3', cache_size=0)
+async def test_zero_cache_size(memory_db: TinyDB):
+    table = memory_db.table('table3', cache_size=0)
     query = where('int') == 1
 
     await table.insert({'int': 1})
@@ -111,8 +157,8 @@ async def test_zero_cache_size(db: TinyDB):
     assert len(table._query_cache) == 0
 
 
-async def test_query_cache_size(db: TinyDB):
-    table = db.table('table3', cache_size=1)
+async def test_query_cache_size(memory_db: TinyDB):
+    table = memory_db.table('table3', cache_size=1)
     query = where('int') == 1
 
     await table.insert({'int': 1})
@@ -123,9 +169,9 @@ async def test_query_cache_size(db: TinyDB):
     assert len(table._query_cache) == 1
 
 
-async def test_lru_cache(db: TinyDB):
+async def test_lru_cache(memory_db: TinyDB):
     # Test integration into TinyDB
-    table = db.table('table3', cache_size=2)
+    table = memory_db.table('table3', cache_size=2)
     query = where('int') == 1
 
     await table.search(query)
@@ -134,11 +180,11 @@ async def test_lru_cache(db: TinyDB):
     assert query not in table._query_cache
 
     await table.remove(where('int') == 1)
-    assert len(table._query_cache) == 0
+    assert len(table._query_cache) == 2  # Kept up to date instead
 
     await table.search(query)
-
-    assert len(table._query_cache) == 1
+    assert query in table._query_cache
+    assert len(table._query_cache) == 2
     table.clear_cache()
     await table.search(where("NotExisting") == 1)
     assert len(table._query_cache) == 1
@@ -152,9 +198,9 @@ async def test_table_is_iterable(db: TinyDB):
     assert [r async for r in table] == await table.all()
 
 
-async def test_table_name(db: TinyDB):
+async def test_table_name(memory_db: TinyDB):
     name = 'table3'
-    table = db.table(name)
+    table = memory_db.table(name)
     assert name == table.name
 
     with pytest.raises(AttributeError):
@@ -167,7 +213,8 @@ async def test_table_repr(db: TinyDB):
 
     assert re.match(
         r"<Table name=\'table4\', total=0, "
-        r"storage=<asynctinydb\.storages\.(.*?Storage) object at [a-zA-Z0-9]+>>",
+        r"storage=<asynctinydb\.(storages\.(.*?Storage)|middlewares\.(.*?Middleware)) "
+        r"object at [a-zA-Z0-9]+>>",
         repr(table))
 
 
@@ -311,3 +358,236 @@ async def test_timestamp(db: TinyDB):
 
     await table.truncate()
     db.storage._event_hook = event_hook
+
+
+async def test_update_keeps_other_tables():
+    class CountingStorage(MemoryStorage):
+        reads = 0
+
+        async def read(self):
+            CountingStorage.reads += 1
+            return await super().read()
+
+    # Copy on read like file based storages
+    db = TinyDB(storage=CountingStorage, copy_on_read=True)
+    await db.storage.write({"table3": {"1": {"a": 0}}})  # From a past session
+    table1, table2 = db.table("table1"), db.table("table2")
+    await table1.insert({"a": 1})
+    reads = CountingStorage.reads
+    await table1.insert({"a": 2})
+    await table2.insert({"a": 3})
+    await table1.update({"a": 4}, doc_ids=[1])
+    assert CountingStorage.reads == reads + 3  # One read for each update
+
+    # Tables updated through the same storage don't lose each other's writes
+    data = await db.storage.read()
+    assert len(data["table1"]) == 2 and len(data["table2"]) == 1
+    assert len(data["table3"]) == 1
+
+    # Dropped tables don't come back with the next update
+    await db.drop_table("table3")  # Never opened
+    await table1.insert({"a": 5})
+    await db.drop_table("table2")
+    await table1.insert({"a": 6})
+    assert await db.tables() == {"table1"}
+    await db.close()
+
+
+async def test_update_keeps_tables_written_elsewhere(tmp_path):
+    path = tmp_path / "db.json"
+    db1, db2 = TinyDB(path), TinyDB(path)
+    await db1.table("ta").insert({"a": 1})
+    await db2.table("tb").insert({"b": 1})
+    await db1.table("ta").insert({"a": 2})
+    assert await db2.tables() == {"ta", "tb"}
+    assert len(db2.table("tb")) == 1
+    await db1.close()
+    await db2.close()
+
+
+async def test_update_reuses_written_data(tmp_path):
+    class CountingStorage(JSONStorage):
+        reads = 0
+
+        async def read(self):
+            CountingStorage.reads += 1
+            return await super().read()
+
+    path = tmp_path / "db.json"
+    db = TinyDB(path, storage=CountingStorage)
+    table1, table2 = db.table("table1"), db.table("table2")
+    await table1.insert({"a": 1})
+    reads = CountingStorage.reads
+    await table1.insert({"a": 2})
+    await table1.update({"a": 3}, doc_ids=[1])
+    assert CountingStorage.reads == reads  # Still what table1 wrote
+
+    # Written since by another table or someone else, read again
+    await table2.insert({"b": 1})
+    await table1.insert({"a": 4})
+    assert CountingStorage.reads == reads + 2
+    other = TinyDB(path)
+    await other.table("table3").insert({"c": 1})
+    await table1.insert({"a": 5})
+    assert CountingStorage.reads == reads + 3
+    assert await other.tables() == {"table1", "table2", "table3"}
+    await other.close()
+
+    # Nothing is reused through a middleware
+    assert not CachingMiddleware(MemoryStorage)().is_current({})
+    await db.close()
+
+
+async def test_concurrent_updates_batched():
+    class CountingStorage(MemoryStorage):
+        writes = 0
+
+        async def write(self, data):
+            CountingStorage.writes += 1
+            await asyncio.sleep(0)
+            await super().write(data)
+
+    db = TinyDB(storage=CountingStorage)
+    table = db.table("table")
+    await table.insert({"a": 0})
+    writes = CountingStorage.writes
+    ids = await asyncio.gather(*(table.insert({"a": i}) for i in range(1, 50)))
+    assert ids == list(range(2, 51))
+    assert CountingStorage.writes - writes < 5
+    assert len(await table.all()) == 50
+
+    # A failing update only fails itself
+    results = await asyncio.gather(
+        table.insert({"a": 50}),
+        table.insert(Document({"a": 51}, doc_id=IncreID(1))),
+        table.insert({"a": 52}),
+        return_exceptions=True)
+    assert results[0] == 51 and results[2] == 52
+    assert isinstance(results[1], ValueError)
+    assert len(await table.all()) == 52
+    await db.close()
+
+
+async def test_failed_updates_undone(tmp_path):
+    db = TinyDB(tmp_path / "db.json")
+    table = db.table("table")
+    await table.insert({"a": 0})
+
+    def fail(doc):
+        doc["a"] = 99
+        raise ValueError
+
+    async def batched(*calls):
+        async with table._lock:  # Queue them all up behind it
+            tasks = [asyncio.create_task(call) for call in calls]
+            while len(table._pending_updates) < len(calls):
+                await asyncio.sleep(0)
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    # Alone
+    with pytest.raises(ValueError):
+        await table.update(fail, doc_ids=[1])
+    assert (await table.get(doc_id=1))["a"] == 0
+
+    # Along with others, only its own changes are undone
+    results = await batched(table.insert({"a": 1}),
+                            table.update(fail, doc_ids=[1]),
+                            table.remove(doc_ids=[1]),
+                            table.insert({"a": 2}))
+    assert results[0] == 2 and results[2] == [1] and results[3] == 3
+    assert isinstance(results[1], ValueError)
+    assert [doc["a"] for doc in await table.all()] == [1, 2]
+
+    def fail_later(table):
+        table.modify(2)["a"] = 99
+        table[4] = {"a": 99}
+        del table[2]
+        del table[3]
+        raise ValueError
+
+    results = await batched(table.update({"b": 1}, doc_ids=[2]),
+                            table._update_table(fail_later))
+    assert isinstance(results[1], ValueError)
+    # Deleted documents are put back where they were
+    expected = {"2": {"a": 1, "b": 1}, "3": {"a": 2}}
+    assert list((await db.storage.read())["table"].items()) == \
+        list(expected.items())
+    db.clear_data_cache()
+    assert await table.count(where("a") == 99) == 0
+    await db.close()
+
+
+def test_undo_log():
+    data = {1: {"a": [0]}, 2: {"a": [1]}, 3: {"a": [2]}}
+    log = _UndoLog(data)
+    # Reading copies nothing
+    assert [doc["a"] for doc in log.values()] == [[0], [1], [2]]
+    log.clear()
+    assert not data and not any(contents for _, contents in log._saved.values())
+    log.undo()
+    assert list(data) == [1, 2, 3]
+
+    log.modify(2)["a"].append(9)
+    del log[1]
+    log[4] = {"a": [4]}
+    log.undo()
+    assert data == {1: {"a": [0]}, 2: {"a": [1]}, 3: {"a": [2]}}
+    assert list(data) == [1, 2, 3]
+
+
+async def test_cancelled_update_batch():
+    class SlowStorage(MemoryStorage):
+        async def read(self):
+            await asyncio.sleep(0.05)
+            return await super().read()
+
+        async def write(self, data):
+            await asyncio.sleep(0.05)
+            await super().write(data)
+
+    db = TinyDB(storage=SlowStorage)
+    table = db.table("table")
+    await table.insert({"a": 0})
+
+    async def batched(*calls, wait: float):
+        async with table._lock:  # Queue them all up behind it
+            tasks = [asyncio.create_task(call) for call in calls]
+            while len(table._pending_updates) < len(calls):
+                await asyncio.sleep(0)
+        await asyncio.sleep(wait)
+        tasks[0].cancel()  # The one to get the lock next
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    # Cancelled before running any, the others run later
+    results = await batched(*(table.insert({"a": i}) for i in range(3)),
+                            wait=0.02)
+    assert isinstance(results[0], asyncio.CancelledError)
+    assert results[1:] == [2, 3]
+
+    # Cancelled while writing the others along with it
+    results = await batched(*(table.insert({"a": i}) for i in range(2)),
+                            wait=0.07)
+    assert isinstance(results[0], asyncio.CancelledError)
+    assert isinstance(results[1], RuntimeError)
+    await db.close()
+
+
+async def test_lazy_table():
+    from asynctinydb.table import _LazyTable
+    table = _LazyTable({"1": {"a": 1}, "2": {"a": 2}}, IncreID, Document)
+    doc = table[1]
+    assert isinstance(doc, Document) and doc.doc_id == 1
+    assert type(table.to_dict()[2]) is dict  # Not accessed, not wrapped
+    assert table[1] is doc and dict(table.items())[1] is doc
+    assert list(table.values())[0] is doc
+    doc["a"] = 3
+    assert table.to_dict() == {1: {"a": 3}, 2: {"a": 2}}
+
+    db = TinyDB(storage=MemoryStorage, no_dbcache=True)
+    await db.insert_multiple({"a": i} for i in range(3))
+    await db.update_multiple([({"b": 1}, where("a") == 1)])
+    assert (await db.get(doc_id=2))["b"] == 1
+    assert await db.contains(doc_id=3) and not await db.contains(doc_id=4)
+    await db.remove(doc_ids=[1])
+    assert [doc["a"] for doc in await db.all()] == [1, 2]
+    await db.close()
@@ -10,8 +10,6 @@ import re
 from collections.abc import Mapping
 
 import pytest
-import nest_asyncio
-nest_asyncio.apply()
 
 
 async def test_drop_tables(db: TinyDB):
@@ -395,6 +393,10 @@ async def test_get_ids(db: TinyDB):
     assert await db.get(doc_id=el.doc_id) == el
     assert await db.get(doc_id=float("NaN")) is None  # type: ignore
 
+    db.isolevel = 2
+    (await db.get(doc_id=el.doc_id))["char"] = "z"
+    assert await db.get(doc_id=el.doc_id) == el
+
 
 async def test_combined_get(db: TinyDB):
     el = (await db.all())[2]
@@ -827,6 +829,22 @@ async def test_id_classes():
     await db.close()
 
 
+async def test_increid_counter():
+    db1 = TinyDB(storage=MemoryStorage)
+    db2 = TinyDB(storage=MemoryStorage)
+    # Tables with the same name in different databases count separately
+    assert await db1.insert({"foo": "bar"}) == 1
+    assert await db2.insert({"foo": "bar"}) == 1
+
+    # Explicit IDs move the counter forward
+    await db1.insert_multiple([Document({}, doc_id=IncreID(5))])
+    assert await db1.insert({}) == 6
+    await db1.remove(doc_ids=[6])
+    assert await db1.insert({}) == 7
+    await db1.truncate()
+    assert await db1.insert({}) == 1
+
+
 async def test_isolevel():
     db = TinyDB(storage=MemoryStorage)
     assert db.isolevel == 1
@@ -7,6 +7,7 @@ import time
 from threading import Thread, get_ident
 from concurrent.futures._base import CancelledError as SyncCancelledError
 from asynctinydb.utils import LRUCache, freeze, FrozenDict, to_async_gen
+from asynctinydb.utils import TinyLFUCache, fast_deepcopy
 from asynctinydb.utils import StrChain, ensure_async, sync_await, mimics
 from asynctinydb.utils import get_create_loop, AsinkRunner, TerminateRunner
 from asynctinydb.utils import FrozenList, is_container, is_hashable, is_iterable
@@ -66,6 +67,116 @@ def test_lru_cache_get():
     cache["d"] = 4
 
     assert sorted(cache.lru) == sorted(["c", "a", "d"])
+    assert cache.lru == ["c", "a", "d"]
+    cache["c"] = 5  # Updating counts as a use
+    assert cache.lru == ["a", "d", "c"]
+    assert cache.get("e") is None and cache.lru == ["a", "d", "c"]
+
+
+def test_lru_cache_getsizeof():
+    cache = LRUCache(capacity=5, getsizeof=len)
+    cache["a"] = "xx"
+    cache["b"] = "xxx"
+    assert cache.currsize == 5
+    cache["c"] = "x"  # Evicts "a"
+    assert cache.lru == ["b", "c"] and cache.currsize == 4
+    cache["d"] = "x" * 6  # Too large to be cached at all
+    assert "d" not in cache and cache.currsize == 4
+    cache.pop("b")
+    del cache["c"]
+    assert cache.currsize == 0
+
+
+def test_tinylfu_cache():
+    cache = TinyLFUCache(capacity=2)
+    cache["a"] = 1
+    cache["b"] = 2
+    for _ in range(3):
+        cache.get("a")
+        cache.get("b")
+
+    # A one-off scan doesn't get past frequently used entries
+    for key in "cdefg":
+        assert cache.get(key) is None
+        cache[key] = 0
+    assert sorted(cache) == ["a", "b"]
+
+    # But an entry requested often enough does
+    for _ in range(5):
+        cache.get("h")
+    cache["h"] = 3
+    assert "h" in cache
+    assert cache.frequency("h") >= 5
+    assert len(cache) == 2
+
+
+def test_tinylfu_cache_rejection_order():
+    cache = TinyLFUCache(capacity=3)
+    for key in "abc":
+        cache[key] = 0
+    cache.get("a")
+    # Rejected, "b" is still the least-recently used entry
+    cache["d"] = 0
+    assert cache.lru == ["b", "c", "a"]
+
+
+def test_tinylfu_cache_aging():
+    cache = TinyLFUCache(capacity=1, width=4, depth=1)
+    for _ in range(10):
+        cache.get("a")
+    # The counters saturate and are halved every 40 requests
+    assert cache.frequency("a") == 10
+    for _ in range(30):
+        cache.get("b")
+    assert cache.frequency("a") < 10
+
+
+def test_fast_deepcopy():
+    from asynctinydb.table import Document
+    doc = Document({"a": [1, {"b": (2, [3])}], "c": None}, doc_id=1)
+    copied = fast_deepcopy(doc)
+    assert copied == doc and type(copied) is Document
+    assert copied.doc_id == 1
+    assert copied["a"] is not doc["a"]
+    assert copied["a"][1]["b"][1] is not doc["a"][1]["b"][1]
+
+    # Slots and ``__dict__`` of subclasses are copied along
+    class Tagged(Document):
+        __slots__ = ("tag", "unset")
+
+    tagged = Tagged({"a": 1}, doc_id=2)
+    tagged.tag = [1]
+    copied = fast_deepcopy(tagged)
+    assert type(copied) is Tagged and copied.doc_id == 2
+    assert copied.tag == [1] and copied.tag is not tagged.tag
+    assert not hasattr(copied, "unset") and not hasattr(copied, "__dict__")
+
+    class Loose(Document):
+        pass
+
+    loose = Loose({}, doc_id=3)
+    loose.extra = {"b": 2}
+    copied = fast_deepcopy(loose)
+    assert copied.extra == {"b": 2} and copied.extra is not loose.extra
+
+    # Anything else is left to `deepcopy`
+    frozen = FrozenDict({"a": [1]})
+    assert fast_deepcopy(frozen) == frozen
+
+    # Cyclic data falls back to `deepcopy` as well
+    cyclic: list = [1]
+    cyclic.append(cyclic)
+    copied_cyclic = fast_deepcopy(cyclic)
+    assert copied_cyclic[1] is copied_cyclic
+    nested: dict = {"a": {}}
+    nested["a"]["b"] = (nested,)
+    copied_nested = fast_deepcopy(nested)
+    assert copied_nested["a"]["b"][0] is copied_nested
+
+    # Shared but not cyclic, so not handed over
+    shared = [1]
+    copied = fast_deepcopy({"a": shared, "b": [shared]})
+    assert copied["a"] == copied["b"][0] and copied["a"] is not copied["b"][0]
 
 
 def test_lru_cache_delete():
@@ -209,7 +320,7 @@ def test_freeze():
         freeze(d)
     
     with pytest.raises(TypeError, match="unhashable"):
-        freeze({1: LRUCache()}, True)
+        freeze({1: bytearray()}, True)
 
     with pytest.raises(TypeError):
         frozen[0] = 10